@@ -1,13 +1,18 @@
+import hashlib
 from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable
 
+from beanie import PydanticObjectId
 from fastapi import Depends, HTTPException
 from fastapi.security import APIKeyHeader, OAuth2PasswordBearer
 from jwt import InvalidTokenError, decode, encode
 from passlib.context import CryptContext
+from pydantic import ValidationError
 
+from app.cache import TTLCache
 from app.config import settings
-from app.models.devices import Device
-from app.models.users import Role, User
+from app.models.devices import Device, DeviceKeyLookup, DevicePrincipal
+from app.models.users import Role, TokenClaims, User
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
@@ -18,6 +23,20 @@ ALGORITHM = settings.hash_algorithm
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 API_KEY_HEADER = APIKeyHeader(name="X-API-Key")
 
+api_key_cache: TTLCache[str, DevicePrincipal] = TTLCache(
+    settings.api_key_cache_size, settings.api_key_cache_ttl
+)
+
+user_cache: TTLCache[PydanticObjectId, User] = TTLCache(
+    settings.user_cache_size, settings.user_cache_ttl
+)
+
+CREDENTIALS_EXCEPTION = HTTPException(
+    status_code=401,
+    detail="Could not validate credentials",
+    headers={"WWW-Authenticate": "Bearer"},
+)
+
 
 async def authenticate_user(username: str, password: str):
     user = await User.find_one(User.username == username)
@@ -28,40 +47,92 @@ async def authenticate_user(username: str, password: str):
     return user
 
 
-async def validate_api_key(api_key: str = Depends(API_KEY_HEADER)) -> Device:
-    device = await Device.find_one({"api_key": api_key})
-    if device is None:
+def api_key_digest(api_key: str) -> str:
+    return hashlib.sha256(api_key.encode()).hexdigest()
+
+
+def forget_api_key(api_key: str) -> None:
+    api_key_cache.pop(api_key_digest(api_key))
+
+
+async def resolve_api_keys(api_keys: Iterable[str]) -> Dict[str, DevicePrincipal]:
+    principals: Dict[str, DevicePrincipal] = {}
+    missing: Dict[str, str] = {}
+    for api_key in set(api_keys):
+        digest = api_key_digest(api_key)
+        principal = api_key_cache.get(digest)
+        if principal is None:
+            missing[api_key] = digest
+        else:
+            principals[api_key] = principal
+    if missing:
+        async for device in Device.find(
+            {"api_key": {"$in": list(missing)}},
+            projection_model=DeviceKeyLookup,
+        ):
+            principal = DevicePrincipal(**device.model_dump(exclude={"api_key"}))
+            api_key_cache.set(missing[device.api_key], principal)
+            principals[device.api_key] = principal
+    return principals
+
+
+async def validate_api_key(
+    api_key: str = Depends(API_KEY_HEADER),
+) -> DevicePrincipal:
+    principal = (await resolve_api_keys([api_key])).get(api_key)
+    if principal is None:
         raise HTTPException(status_code=401, detail="Invalid API key")
-    return device
+    return principal
 
 
-async def get_current_user(token: str = Depends(oauth2_scheme)) -> User:
-    credentials_exception = HTTPException(
-        status_code=401,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
+def decode_token(token: str) -> TokenClaims:
     try:
         payload = decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-    except InvalidTokenError:
-        raise credentials_exception
+        return TokenClaims.model_validate(payload)
+    except (InvalidTokenError, ValidationError):
+        raise CREDENTIALS_EXCEPTION
+
+
+def forget_user(user_id: PydanticObjectId) -> None:
+    user_cache.pop(user_id)
+
 
-    user = await User.find_one({"username": username})
+async def load_user(claims: TokenClaims) -> User:
+    user = user_cache.get(claims.uid)
     if user is None:
-        raise credentials_exception
+        user = await User.get(claims.uid)
+        if user is None:
+            raise CREDENTIALS_EXCEPTION
+        user_cache.set(claims.uid, user)
     return user
 
 
+async def get_current_user(token: str = Depends(oauth2_scheme)) -> User:
+    return await load_user(decode_token(token))
+
+
 def require_role(required_role: Role):
-    async def role_checker(current_user: User = Depends(get_current_user)) -> User:
-        if required_role and current_user.role.value < required_role.value:
+    async def role_checker(token: str = Depends(oauth2_scheme)) -> TokenClaims:
+        claims = decode_token(token)
+        if required_role and claims.role.value < required_role.value:
+            raise HTTPException(status_code=403, detail="Permission denied")
+        user = await load_user(claims)
+        if required_role and user.role.value < required_role.value:
             raise HTTPException(status_code=403, detail="Permission denied")
-        return current_user
+        return claims.model_copy(update={"role": user.role})
 
     return role_checker
 
 
+def require_user(required_role: Role):
+    async def user_loader(
+        claims: TokenClaims = Depends(require_role(required_role)),
+    ) -> User:
+        return await load_user(claims)
+
+    return user_loader
+
+
 def create_access_token(data: dict):
     to_encode = data.copy()
     expire = datetime.now(timezone.utc) + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -0,0 +1,59 @@
+import asyncio
+from contextlib import suppress
+from typing import List, Optional, Type
+
+from beanie import Document
+
+from app.metrics import metrics
+
+
+class ChangeStreamWatcher:
+    name: str
+    model: Type[Document]
+    pipeline: List[dict] = []
+    full_document: Optional[str] = None
+
+    def __init__(self) -> None:
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    def reset(self) -> None:
+        pass
+
+    def handle(self, change: dict) -> None:
+        raise NotImplementedError
+
+    async def _run(self) -> None:
+        resume_token = None
+        self.reset()
+        while True:
+            try:
+                async with self.model.get_motor_collection().watch(
+                    self.pipeline,
+                    full_document=self.full_document,
+                    resume_after=resume_token,
+                ) as stream:
+                    async for change in stream:
+                        resume_token = stream.resume_token
+                        self.handle(change)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                metrics.incr(f"{self.name}.change_stream_errors")
+                print(
+                    f"{self.model.get_settings().name} change stream interrupted: {e}"
+                )
+                await asyncio.sleep(1)
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
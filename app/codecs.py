@@ -0,0 +1,110 @@
+from typing import Any, Callable, Dict, Optional
+
+from fastapi import HTTPException, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.exceptions import RequestValidationError
+from fastapi.routing import APIRoute
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover
+    msgpack = None
+
+try:
+    import cbor2
+except ImportError:  # pragma: no cover
+    cbor2 = None
+
+MSGPACK = "application/msgpack"
+CBOR = "application/cbor"
+MEDIA_TYPE_ALIASES = {
+    "application/x-msgpack": MSGPACK,
+    "application/vnd.msgpack": MSGPACK,
+}
+
+DECODERS: Dict[str, Callable[[bytes], Any]] = {}
+ENCODERS: Dict[str, Callable[[Any], bytes]] = {}
+if msgpack is not None:
+    DECODERS[MSGPACK] = lambda body: msgpack.unpackb(body, raw=False)
+    ENCODERS[MSGPACK] = msgpack.packb
+if cbor2 is not None:
+    DECODERS[CBOR] = cbor2.loads
+    ENCODERS[CBOR] = cbor2.dumps
+
+
+def media_type(value: str) -> str:
+    media = value.split(";", 1)[0].strip().lower()
+    return MEDIA_TYPE_ALIASES.get(media, media)
+
+
+def media_quality(value: str) -> Optional[float]:
+    for param in value.split(";")[1:]:
+        name, _, quality = param.strip().partition("=")
+        if name.strip().lower() == "q":
+            try:
+                return float(quality)
+            except ValueError:
+                return None
+    return 1.0
+
+
+def accepted_encoding(request: Request) -> Optional[str]:
+    weights: Dict[str, float] = {}
+    for value in request.headers.get("accept", "").split(","):
+        quality = media_quality(value)
+        if quality is None:
+            continue
+        media = media_type(value)
+        weights[media] = max(quality, weights.get(media, 0.0))
+    candidates = [(weights[media], media) for media in weights if media in ENCODERS]
+    if not candidates:
+        return None
+    quality, media = max(candidates, key=lambda candidate: candidate[0])
+    if quality <= 0 or weights.get("application/json", 0.0) >= quality:
+        return None
+    return media
+
+
+def encoded_response(
+    request: Request, content: Any, response: Optional[Response] = None
+) -> Any:
+    media = accepted_encoding(request)
+    if media is None:
+        return content
+    headers = dict(response.headers) if response is not None else None
+    return Response(
+        ENCODERS[media](jsonable_encoder(content)), media_type=media, headers=headers
+    )
+
+
+async def decoded_request(request: Request, media: str) -> Request:
+    if media not in DECODERS:
+        raise HTTPException(status_code=415, detail=f"Unsupported media type {media}")
+    body = await request.body()
+    try:
+        decoded = DECODERS[media](body)
+    except ValueError:
+        raise RequestValidationError(
+            [{"type": "value_error", "loc": ("body",), "msg": f"Invalid {media} body"}]
+        )
+    headers = [
+        (name, b"application/json" if name == b"content-type" else value)
+        for name, value in request.scope["headers"]
+    ]
+    decoded_request = Request({**request.scope, "headers": headers}, request.receive)
+    decoded_request._body = body
+    decoded_request._json = decoded
+    return decoded_request
+
+
+class BinaryBodyRoute(APIRoute):
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+
+        async def binary_body_handler(request: Request) -> Response:
+            media = media_type(request.headers.get("content-type", ""))
+            if media in (MSGPACK, CBOR):
+                request = await decoded_request(request, media)
+            return await handler(request)
+
+        return binary_body_handler
@@ -0,0 +1,266 @@
+import io
+import time
+import zlib
+from typing import Dict, List, Optional, Tuple, Type
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config import settings
+from app.metrics import metrics
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+UNCOMPRESSED_TYPES = ("text/event-stream", "application/vnd.apache.parquet")
+ZSTD_INPUT_CHUNK = 16384
+DECOMPRESSION_ERRORS: Tuple[Type[Exception], ...] = (zlib.error, ValueError)
+if zstandard is not None:
+    DECOMPRESSION_ERRORS += (zstandard.ZstdError,)
+
+
+class CompressionError(Exception):
+    def __init__(self, status_code: int, detail: str) -> None:
+        self.status_code = status_code
+        self.detail = detail
+
+
+class StreamCompressor:
+    def __init__(self, encoding: str) -> None:
+        self.encoding = encoding
+        if encoding == "zstd":
+            self._compressor = zstandard.ZstdCompressor(
+                level=settings.compression_zstd_level
+            ).compressobj()
+            self._flush_block = zstandard.COMPRESSOBJ_FLUSH_BLOCK
+            self._flush_finish = zstandard.COMPRESSOBJ_FLUSH_FINISH
+        else:
+            self._compressor = zlib.compressobj(
+                settings.compression_gzip_level, zlib.DEFLATED, 31
+            )
+            self._flush_block = zlib.Z_SYNC_FLUSH
+            self._flush_finish = zlib.Z_FINISH
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.seconds = 0.0
+
+    def compress(self, data: bytes, finish: bool) -> bytes:
+        started = time.perf_counter()
+        output = self._compressor.compress(data) + self._compressor.flush(
+            self._flush_finish if finish else self._flush_block
+        )
+        self.seconds += time.perf_counter() - started
+        self.bytes_in += len(data)
+        self.bytes_out += len(output)
+        if finish:
+            self.record()
+        return output
+
+    def record(self) -> None:
+        prefix = f"compression.{self.encoding}"
+        metrics.incr(f"{prefix}.responses")
+        metrics.incr(f"{prefix}.bytes_in", self.bytes_in)
+        metrics.incr(f"{prefix}.bytes_out", self.bytes_out)
+        metrics.incr(f"{prefix}.seconds", self.seconds)
+        totals = metrics.counters
+        metrics.gauge(
+            f"{prefix}.ratio",
+            totals[f"{prefix}.bytes_out"] / totals[f"{prefix}.bytes_in"],
+        )
+
+
+def supported_encodings() -> List[str]:
+    return ["zstd", "gzip"] if zstandard is not None else ["gzip"]
+
+
+def preferred_encoding(accept_encoding: str) -> Optional[str]:
+    weights: Dict[str, float] = {}
+    for value in accept_encoding.split(","):
+        coding, _, params = value.strip().lower().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                continue
+        weights[coding.strip()] = quality
+    candidates = [
+        (weights.get(encoding, weights.get("*", 0.0)), encoding)
+        for encoding in supported_encodings()
+    ]
+    quality, encoding = max(candidates, key=lambda candidate: candidate[0])
+    return encoding if quality > 0 else None
+
+
+def decompress_zstd(body: bytes, limit: int) -> Tuple[bytes, bool]:
+    decompressor = zstandard.ZstdDecompressor().decompressobj()
+    stream = io.BytesIO(body)
+    chunks: List[bytes] = []
+    size = 0
+    while size <= limit and not decompressor.eof:
+        chunk = stream.read(ZSTD_INPUT_CHUNK)
+        if not chunk:
+            break
+        chunks.append(decompressor.decompress(chunk))
+        size += len(chunks[-1])
+    return b"".join(chunks), decompressor.eof
+
+
+def decompress(body: bytes, encoding: str, limit: int) -> bytes:
+    try:
+        if encoding == "gzip":
+            decompressor = zlib.decompressobj(47)
+            data = decompressor.decompress(body, limit + 1)
+            complete = decompressor.eof
+        elif encoding == "zstd" and zstandard is not None:
+            data, complete = decompress_zstd(body, limit)
+        else:
+            raise CompressionError(415, f"Unsupported content encoding {encoding}")
+    except DECOMPRESSION_ERRORS as e:
+        raise CompressionError(400, "Invalid compressed body") from e
+    if len(data) > limit:
+        raise CompressionError(413, "Request body too large")
+    if not complete:
+        raise CompressionError(400, "Invalid compressed body")
+    return data
+
+
+async def read_body(receive: Receive, limit: int) -> bytes:
+    chunks: List[bytes] = []
+    size = 0
+    while True:
+        message = await receive()
+        chunk = message.get("body", b"")
+        size += len(chunk)
+        if size > limit:
+            raise CompressionError(413, "Request body too large")
+        chunks.append(chunk)
+        if not message.get("more_body", False):
+            return b"".join(chunks)
+
+
+class CompressionMiddleware:
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        content_encoding = headers.get("content-encoding", "").strip().lower()
+        if content_encoding and content_encoding != "identity":
+            try:
+                scope, receive = await self.decompressed(
+                    scope, receive, content_encoding
+                )
+            except CompressionError as e:
+                metrics.incr("decompression.rejected")
+                response = JSONResponse({"detail": e.detail}, status_code=e.status_code)
+                await response(scope, receive, send)
+                return
+
+        encoding = preferred_encoding(headers.get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        responder = CompressedResponder(self.app, encoding, self.minimum_size)
+        await responder(scope, receive, send)
+
+    async def decompressed(
+        self, scope: Scope, receive: Receive, encoding: str
+    ) -> Tuple[Scope, Receive]:
+        limit = settings.request_body_max
+        started = time.perf_counter()
+        body = await read_body(receive, limit)
+        data = decompress(body, encoding, limit)
+        metrics.incr("decompression.requests")
+        metrics.incr("decompression.bytes_in", len(body))
+        metrics.incr("decompression.bytes_out", len(data))
+        metrics.incr("decompression.seconds", time.perf_counter() - started)
+
+        request_headers = MutableHeaders(
+            scope={**scope, "headers": list(scope["headers"])}
+        )
+        del request_headers["content-encoding"]
+        request_headers["content-length"] = str(len(data))
+        pending = True
+
+        async def decompressed_receive() -> Message:
+            nonlocal pending
+            if pending:
+                pending = False
+                return {"type": "http.request", "body": data, "more_body": False}
+            return await receive()
+
+        return {**scope, "headers": request_headers.raw}, decompressed_receive
+
+
+class CompressedResponder:
+    def __init__(self, app: ASGIApp, encoding: str, minimum_size: int) -> None:
+        self.app = app
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.send: Send
+        self.start_message: Optional[Message] = None
+        self.compressor: Optional[StreamCompressor] = None
+        self.passthrough = False
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        self.send = send
+        await self.app(scope, receive, self.send_compressed)
+
+    async def send_compressed(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            self.start_message = message
+            return
+        if message["type"] != "http.response.body":
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.passthrough:
+            await self.send(message)
+            return
+        if self.compressor is not None:
+            await self.send(
+                {
+                    "type": "http.response.body",
+                    "body": self.compressor.compress(body, finish=not more_body),
+                    "more_body": more_body,
+                }
+            )
+            return
+
+        headers = MutableHeaders(raw=self.start_message["headers"])
+        if (
+            "content-encoding" in headers
+            or headers.get("content-type", "").startswith(UNCOMPRESSED_TYPES)
+            or (not more_body and len(body) < self.minimum_size)
+        ):
+            self.passthrough = True
+            await self.send(self.start_message)
+            await self.send(message)
+            return
+
+        self.compressor = StreamCompressor(self.encoding)
+        body = self.compressor.compress(body, finish=not more_body)
+        headers["content-encoding"] = self.encoding
+        headers.add_vary_header("Accept-Encoding")
+        etag = headers.get("etag")
+        if etag and not etag.startswith("W/"):
+            headers["etag"] = f"W/{etag}"
+        if more_body:
+            del headers["content-length"]
+        else:
+            headers["content-length"] = str(len(body))
+        await self.send(self.start_message)
+        await self.send(
+            {"type": "http.response.body", "body": body, "more_body": more_body}
+        )
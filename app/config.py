@@ -16,6 +16,54 @@ class Settings(BaseSettings):
     initial_user_mail: str
     initial_user_pass: str
     cors_origins: list[str] | None = None
+    verify_indexes: bool = False
+    api_key_cache_size: int = 10000
+    api_key_cache_ttl: float = 60.0
+    user_cache_size: int = 1000
+    user_cache_ttl: float = 30.0
+    device_data_cap: int = 24
+    device_data_batch_max: int = 1000
+    ingest_buffer_enabled: bool = False
+    ingest_buffer_max: int = 10000
+    ingest_flush_size: int = 500
+    ingest_flush_interval: float = 1.0
+    ingest_flush_retries: int = 3
+    device_data_retention_days: int = 0
+    device_rollup_retention_days: int = 0
+    retention_prune_enabled: bool = False
+    retention_prune_interval: float = 3600.0
+    retention_prune_batch: int = 100
+    live_queue_size: int = 1000
+    live_heartbeat_interval: float = 15.0
+    live_max_devices: int = 100
+    live_change_stream: bool = False
+    notes_change_stream: bool = False
+    notes_poll_timeout: float = 30.0
+    notes_poll_timeout_max: float = 300.0
+    schema_cache_size: int = 1024
+    stats_max_time_ms: int = 5000
+    hot_window_size: int = 100
+    hot_window_max_readings: int = 100000
+    hot_window_ttl: float = 300.0
+    latest_max_devices: int = 1000
+    latest_concurrency: int = 16
+    idempotency_ttl: int = 86400
+    idempotency_cache_per_device: int = 256
+    idempotency_cache_devices: int = 10000
+    ingest_rate: float = 0.0
+    ingest_burst: int = 60
+    ingest_rate_shared: bool = False
+    ingest_rate_max_devices: int = 100000
+    compression_min_size: int = 1024
+    compression_gzip_level: int = 6
+    compression_zstd_level: int = 3
+    request_body_max: int = 10 * 1024 * 1024
+    listener_host: str = "127.0.0.1"
+    listener_udp_port: int = 0
+    listener_tcp_port: int = 0
+    listener_queue_size: int = 10000
+    listener_batch_size: int = 500
+    listener_line_max: int = 65536
 
     model_config = SettingsConfigDict(env_file=".env", env_file_encoding="utf-8")
 
@@ -0,0 +1,52 @@
+import hashlib
+from typing import Any, Callable, Optional, Type
+
+from beanie import Document, PydanticObjectId
+from bson.errors import InvalidId
+from fastapi import Request, Response
+from pydantic import BaseModel
+
+from app.models.base import DocumentRevision
+
+
+def entity_tag(*parts: Any) -> str:
+    key = "|".join(str(part) for part in parts).encode()
+    return f'"{hashlib.blake2b(key, digest_size=12).hexdigest()}"'
+
+
+def document_tag(document: Any, *extra: Any) -> str:
+    return entity_tag(
+        document.id, document.revision_id or document.updated_date, *extra
+    )
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    tags = [tag.strip().removeprefix("W/") for tag in header.split(",")]
+    return "*" in tags or etag in tags
+
+
+async def not_modified(
+    request: Request,
+    model: Type[Document],
+    document_id: Any,
+    tag: Callable[[Any], str] = document_tag,
+    projection_model: Type[BaseModel] = DocumentRevision,
+) -> Optional[Response]:
+    if not request.headers.get("if-none-match"):
+        return None
+    try:
+        document_id = PydanticObjectId(document_id)
+    except (InvalidId, TypeError):
+        return None
+    revision = await model.find_one(
+        {"_id": document_id}, projection_model=projection_model
+    )
+    if revision is None:
+        return None
+    etag = tag(revision)
+    if not etag_matches(request, etag):
+        return None
+    return Response(status_code=304, headers={"ETag": etag})
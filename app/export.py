@@ -0,0 +1,227 @@
+import csv
+import io
+import json
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from motor.motor_asyncio import AsyncIOMotorCursor
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover
+    pa = None
+
+EXPORT_BATCH_SIZE = 1000
+OVERFLOW_COLUMN = "_extra"
+
+
+def json_default(value: Any) -> str:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def export_row(document: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "_id": str(document["_id"]),
+        "created_date": document["created_date"].isoformat(),
+        "data": document.get("data", {}),
+    }
+
+
+async def ndjson_rows(cursor: AsyncIOMotorCursor) -> AsyncIterator[str]:
+    lines: List[str] = []
+    async for document in cursor:
+        lines.append(json.dumps(export_row(document), default=json_default))
+        if len(lines) >= EXPORT_BATCH_SIZE:
+            yield "\n".join(lines) + "\n"
+            lines.clear()
+    if lines:
+        yield "\n".join(lines) + "\n"
+
+
+def csv_value(value: Any) -> Any:
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, default=json_default)
+    return value
+
+
+async def csv_rows(
+    cursor: AsyncIOMotorCursor, fields: Optional[List[str]]
+) -> AsyncIterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    overflow = fields is None
+    if fields is not None:
+        writer.writerow(["_id", "created_date", *fields])
+    rows = 0
+    async for document in cursor:
+        row = export_row(document)
+        if fields is None:
+            fields = list(row["data"])
+            writer.writerow(["_id", "created_date", *fields, OVERFLOW_COLUMN])
+        values = [csv_value(row["data"].get(field)) for field in fields]
+        if overflow:
+            extra = {k: v for k, v in row["data"].items() if k not in fields}
+            values.append(json.dumps(extra, default=json_default) if extra else "")
+        writer.writerow([row["_id"], row["created_date"], *values])
+        rows += 1
+        if rows % EXPORT_BATCH_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+class ChunkSink(io.RawIOBase):
+    def __init__(self) -> None:
+        self.chunks: List[bytes] = []
+        self.position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def column_type(values: List[Any]) -> "pa.DataType":
+    try:
+        inferred = pa.array(values).type
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        return pa.string()
+    if pa.types.is_integer(inferred) or pa.types.is_floating(inferred):
+        return pa.float64()
+    if pa.types.is_boolean(inferred) or pa.types.is_timestamp(inferred):
+        return inferred
+    return pa.string()
+
+
+def coerce(value: Any, data_type: "pa.DataType") -> Any:
+    if value is None:
+        return None
+    if pa.types.is_string(data_type):
+        return (
+            value if isinstance(value, str) else json.dumps(value, default=json_default)
+        )
+    if pa.types.is_floating(data_type):
+        is_number = isinstance(value, (int, float)) and not isinstance(value, bool)
+        return float(value) if is_number else None
+    if pa.types.is_boolean(data_type):
+        return value if isinstance(value, bool) else None
+    return value if isinstance(value, datetime) else None
+
+
+def column(values: List[Any], data_type: "pa.DataType") -> "pa.Array":
+    try:
+        return pa.array(values, type=data_type)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        return pa.array([coerce(value, data_type) for value in values], type=data_type)
+
+
+def overflow_value(data: Dict[str, Any], fields: List[str]) -> Optional[str]:
+    extra = {key: value for key, value in data.items() if key not in fields}
+    return json.dumps(extra, default=json_default) if extra else None
+
+
+def record_batch(
+    documents: List[Dict[str, Any]], schema: "pa.Schema"
+) -> "pa.RecordBatch":
+    fields = [name for name in schema.names[2:] if name != OVERFLOW_COLUMN]
+    arrays = [
+        pa.array([str(document["_id"]) for document in documents], type=pa.string()),
+        pa.array(
+            [document["created_date"] for document in documents],
+            type=schema.field("created_date").type,
+        ),
+    ]
+    for field in fields:
+        arrays.append(
+            column(
+                [document.get("data", {}).get(field) for document in documents],
+                schema.field(field).type,
+            )
+        )
+    if OVERFLOW_COLUMN in schema.names:
+        arrays.append(
+            pa.array(
+                [
+                    overflow_value(document.get("data", {}), fields)
+                    for document in documents
+                ],
+                type=pa.string(),
+            )
+        )
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def batch_schema(
+    documents: List[Dict[str, Any]], fields: Optional[List[str]]
+) -> "pa.Schema":
+    columns = [
+        ("_id", pa.string()),
+        ("created_date", pa.timestamp("ms", tz="UTC")),
+    ]
+    overflow = fields is None
+    if overflow:
+        # The schema is fixed by the first batch. Keys that are missing or
+        # always null there go to OVERFLOW_COLUMN as JSON instead of being
+        # dropped or typed as string. Requested fields always get a column;
+        # one that is all null in the first batch is typed as string, so its
+        # later values are exported as JSON text.
+        fields = [
+            key
+            for key in dict.fromkeys(
+                key for document in documents for key in document["data"]
+            )
+            if any(document["data"].get(key) is not None for document in documents)
+            and key != OVERFLOW_COLUMN
+        ]
+    for field in fields:
+        values = [document["data"].get(field) for document in documents]
+        columns.append((field, column_type(values)))
+    if overflow:
+        columns.append((OVERFLOW_COLUMN, pa.string()))
+    return pa.schema(columns)
+
+
+async def columnar_rows(
+    cursor: AsyncIOMotorCursor, fields: Optional[List[str]], export_format: str
+) -> AsyncIterator[bytes]:
+    sink = ChunkSink()
+    writer = None
+    schema = None
+    documents: List[Dict[str, Any]] = []
+
+    def write(batch_documents: List[Dict[str, Any]]) -> None:
+        nonlocal writer, schema
+        if writer is None:
+            schema = batch_schema(batch_documents, fields)
+            if export_format == "parquet":
+                writer = pq.ParquetWriter(sink, schema)
+            else:
+                writer = pa.ipc.new_stream(sink, schema)
+        writer.write_batch(record_batch(batch_documents, schema))
+
+    async for document in cursor:
+        documents.append(document)
+        if len(documents) >= EXPORT_BATCH_SIZE:
+            write(documents)
+            documents = []
+            yield sink.drain()
+    if documents or writer is None:
+        write(documents)
+    writer.close()
+    yield sink.drain()
@@ -0,0 +1,102 @@
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Iterable, List, Optional, Set, Tuple
+
+from beanie import PydanticObjectId
+from pymongo.errors import BulkWriteError
+
+from app.config import settings
+from app.metrics import metrics
+from app.models.devices import DeviceReadingKey
+
+ReadingKey = Tuple[PydanticObjectId, str]
+
+
+class RecentIds:
+    def __init__(self) -> None:
+        self.devices: OrderedDict[PydanticObjectId, OrderedDict[str, None]] = (
+            OrderedDict()
+        )
+
+    def __contains__(self, key: ReadingKey) -> bool:
+        device_id, reading_id = key
+        ids = self.devices.get(device_id)
+        return ids is not None and reading_id in ids
+
+    def add(self, key: ReadingKey) -> None:
+        device_id, reading_id = key
+        ids = self.devices.get(device_id)
+        if ids is None:
+            ids = self.devices[device_id] = OrderedDict()
+        self.devices.move_to_end(device_id)
+        ids[reading_id] = None
+        ids.move_to_end(reading_id)
+        while len(ids) > settings.idempotency_cache_per_device:
+            ids.popitem(last=False)
+        while len(self.devices) > settings.idempotency_cache_devices:
+            self.devices.popitem(last=False)
+
+    def discard(self, key: ReadingKey) -> None:
+        device_id, reading_id = key
+        ids = self.devices.get(device_id)
+        if ids is not None:
+            ids.pop(reading_id, None)
+
+    def clear(self) -> None:
+        self.devices.clear()
+
+
+recent_ids = RecentIds()
+
+
+async def claim_readings(keys: Iterable[Optional[ReadingKey]]) -> List[bool]:
+    keys = list(keys)
+    claimed = [True] * len(keys)
+    pending: List[Tuple[int, ReadingKey]] = []
+    seen: Set[ReadingKey] = set()
+    for index, key in enumerate(keys):
+        if key is None:
+            continue
+        if key in seen or key in recent_ids:
+            metrics.incr("idempotency.cache_hits")
+            claimed[index] = False
+            continue
+        seen.add(key)
+        pending.append((index, key))
+    if pending:
+        now = datetime.now(timezone.utc)
+        try:
+            await DeviceReadingKey.get_motor_collection().insert_many(
+                [
+                    {"device": device_id, "reading_id": reading_id, "created_date": now}
+                    for _, (device_id, reading_id) in pending
+                ],
+                ordered=False,
+            )
+        except BulkWriteError as e:
+            for error in e.details["writeErrors"]:
+                if error["code"] != 11000:
+                    raise
+                claimed[pending[error["index"]][0]] = False
+        for _, key in pending:
+            recent_ids.add(key)
+    duplicates = claimed.count(False)
+    if duplicates:
+        metrics.incr("idempotency.duplicates", duplicates)
+    return claimed
+
+
+async def release_readings(keys: Iterable[Optional[ReadingKey]]) -> None:
+    keys = [key for key in keys if key is not None]
+    if not keys:
+        return
+    for key in keys:
+        recent_ids.discard(key)
+    await DeviceReadingKey.get_motor_collection().delete_many(
+        {
+            "$or": [
+                {"device": device_id, "reading_id": reading_id}
+                for device_id, reading_id in keys
+            ]
+        }
+    )
@@ -0,0 +1,154 @@
+import asyncio
+import sys
+from datetime import datetime, timezone
+from typing import Any, List, NamedTuple, Optional, Tuple, Type
+
+from beanie import Document, PydanticObjectId, init_beanie
+from beanie.odm.utils.pydantic import get_model_fields
+from beanie.odm.utils.typing import get_index_attributes
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app.config import settings
+from app.models import DOCUMENT_MODELS
+from app.models.devices import Device, DeviceData, DeviceRollup
+from app.models.journals import Journal
+from app.models.pages import Page
+from app.models.users import User
+
+IndexKey = Tuple[Tuple[str, Any], ...]
+
+
+class QueryShape(NamedTuple):
+    name: str
+    model: Type[Document]
+    filter: dict
+    sort: Optional[List[Tuple[str, int]]] = None
+
+
+QUERY_SHAPES = [
+    QueryShape("authenticate_user", User, {"username": ""}),
+    QueryShape("create_user", User, {"email": ""}),
+    QueryShape("validate_api_key", Device, {"api_key": {"$in": [""]}}),
+    QueryShape("find_device", Device, {"device_id": ""}),
+    QueryShape("get_latest_readings", Device, {"device_id": {"$regex": "^device"}}),
+    QueryShape(
+        "latest_readings",
+        DeviceData,
+        {"device": PydanticObjectId()},
+        [("created_date", -1)],
+    ),
+    QueryShape(
+        "get_device_readings",
+        DeviceData,
+        {
+            "device": PydanticObjectId(),
+            "created_date": {"$gte": datetime.now(timezone.utc)},
+        },
+        [("created_date", 1), ("_id", 1)],
+    ),
+    QueryShape(
+        "get_device_stats",
+        DeviceData,
+        {
+            "device": PydanticObjectId(),
+            "created_date": {"$gte": datetime.now(timezone.utc)},
+            "data.value": {"$type": "number"},
+        },
+    ),
+    QueryShape(
+        "get_device_series",
+        DeviceRollup,
+        {"device": PydanticObjectId(), "field": "", "resolution": "1h"},
+        [("bucket", 1)],
+    ),
+    QueryShape("create_journal", Journal, {"title": ""}),
+    QueryShape("create_page", Page, {"title": ""}),
+]
+
+
+def declared_indexes(model: Type[Document]) -> List[IndexKey]:
+    keys: List[IndexKey] = []
+    for name, field in get_model_fields(model).items():
+        attributes = get_index_attributes(field)
+        if attributes is not None:
+            keys.append(((field.alias or name, attributes[0]),))
+    for index in model.get_settings().indexes:
+        keys.append(tuple(index.index.document["key"].items()))
+    return keys
+
+
+async def missing_indexes(model: Type[Document]) -> List[IndexKey]:
+    index_information = await model.get_motor_collection().index_information()
+    live = {tuple(details["key"]) for details in index_information.values()}
+    return [key for key in declared_indexes(model) if key not in live]
+
+
+def winning_plans(explain: Any) -> List[dict]:
+    plans: List[dict] = []
+    if isinstance(explain, dict):
+        for key, value in explain.items():
+            if key == "winningPlan":
+                plans.append(value)
+            else:
+                plans.extend(winning_plans(value))
+    elif isinstance(explain, list):
+        for value in explain:
+            plans.extend(winning_plans(value))
+    return plans
+
+
+def is_collection_scan(plan: Any) -> bool:
+    if isinstance(plan, dict):
+        if plan.get("stage") == "COLLSCAN":
+            return True
+        return any(is_collection_scan(value) for value in plan.values())
+    if isinstance(plan, list):
+        return any(is_collection_scan(value) for value in plan)
+    return False
+
+
+async def collection_scans(shapes: List[QueryShape] = QUERY_SHAPES) -> List[str]:
+    scans: List[str] = []
+    for shape in shapes:
+        cursor = shape.model.get_motor_collection().find(shape.filter)
+        if shape.sort:
+            cursor = cursor.sort(shape.sort)
+        explain = await cursor.explain()
+        if any(is_collection_scan(plan) for plan in winning_plans(explain)):
+            scans.append(shape.name)
+    return scans
+
+
+async def verify_indexes(
+    models: List[Type[Document]] = DOCUMENT_MODELS,
+    shapes: List[QueryShape] = QUERY_SHAPES,
+) -> List[str]:
+    problems: List[str] = []
+    for model in models:
+        for key in await missing_indexes(model):
+            problems.append(f"{model.get_collection_name()}: missing index {list(key)}")
+    for name in await collection_scans(shapes):
+        problems.append(f"{name}: query falls back to COLLSCAN")
+    return problems
+
+
+async def main() -> int:
+    client = AsyncIOMotorClient(settings.mongodb_uri)
+    try:
+        await init_beanie(
+            database=client[settings.mongo_db],
+            document_models=DOCUMENT_MODELS,
+            skip_indexes=True,
+        )
+        problems = await verify_indexes()
+    finally:
+        client.close()
+    for problem in problems:
+        print(problem)
+    if not problems:
+        print("All declared indexes exist and no query falls back to COLLSCAN")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
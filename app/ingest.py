@@ -0,0 +1,220 @@
+import asyncio
+import math
+from collections import defaultdict
+from contextlib import suppress
+from typing import Dict, List, Optional, Tuple
+
+from beanie import PydanticObjectId
+from fastapi import HTTPException
+from pymongo.errors import BulkWriteError
+
+from app.config import settings
+from app.idempotency import ReadingKey, claim_readings, release_readings
+from app.live import publish_readings
+from app.metrics import metrics
+from app.models.devices import Device, DeviceData, DeviceReading
+from app.rollups import update_rollups
+
+READING_FIELDS = set(DeviceReading.model_fields)
+
+
+def reading_update(readings: List[DeviceData]) -> dict:
+    update: dict = {
+        "$inc": {"reading_count": len(readings)},
+        "$max": {"last_reading_date": max(r.created_date for r in readings)},
+    }
+    if settings.device_data_cap > 0:
+        update["$push"] = {
+            "recent_data": {
+                "$each": [
+                    reading.model_dump(by_alias=True, include=READING_FIELDS)
+                    for reading in readings
+                ],
+                "$sort": {"created_date": 1},
+                "$slice": -settings.device_data_cap,
+            }
+        }
+    return update
+
+
+def group_by_device(
+    readings: List[DeviceData],
+) -> Dict[PydanticObjectId, List[DeviceData]]:
+    grouped: Dict[PydanticObjectId, List[DeviceData]] = defaultdict(list)
+    for reading in readings:
+        grouped[reading.device].append(reading)
+    return grouped
+
+
+def insert_progress(error: Exception) -> Tuple[int, int]:
+    if not isinstance(error, BulkWriteError):
+        return 0, 0
+    return error.details.get("nInserted", 0), len(error.details.get("writeErrors", []))
+
+
+async def apply_readings(readings: List[DeviceData]) -> None:
+    if not readings:
+        return
+    try:
+        await Device.atomic_update(
+            {
+                device_id: reading_update(device_readings)
+                for device_id, device_readings in group_by_device(readings).items()
+            }
+        )
+        await update_rollups(readings)
+    except Exception as e:
+        metrics.incr("ingest.apply_errors")
+        print(f"Error updating devices for {len(readings)} stored readings: {e}")
+    publish_readings(readings)
+
+
+async def store_readings(readings: List[DeviceData]) -> None:
+    if not readings:
+        return
+    await DeviceData.insert_many(readings)
+    await apply_readings(readings)
+
+
+class IngestBuffer:
+    def __init__(self) -> None:
+        self.pending: Dict[PydanticObjectId, List[DeviceData]] = defaultdict(list)
+        self.keys: Dict[PydanticObjectId, ReadingKey] = {}
+        self.size = 0
+        self.failures = 0
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    def put(
+        self,
+        readings: List[DeviceData],
+        keys: Optional[List[Optional[ReadingKey]]] = None,
+    ) -> bool:
+        if self.size + len(readings) > settings.ingest_buffer_max:
+            return False
+        for reading, key in zip(readings, keys or [None] * len(readings)):
+            self.pending[reading.device].append(reading)
+            if key is not None:
+                self.keys[reading.id] = key
+        self.size += len(readings)
+        if self.size >= settings.ingest_flush_size and self._wakeup is not None:
+            self._wakeup.set()
+        return True
+
+    def settle(self, readings: List[DeviceData]) -> None:
+        for reading in readings:
+            self.keys.pop(reading.id, None)
+
+    async def drop(self, readings: List[DeviceData]) -> None:
+        metrics.incr("ingest.dropped", len(readings))
+        keys = [self.keys.pop(reading.id, None) for reading in readings]
+        try:
+            await release_readings(keys)
+        except Exception as e:
+            print(
+                f"Error releasing reading IDs of {len(readings)} dropped readings: {e}"
+            )
+
+    async def requeue(self, readings: List[DeviceData]) -> None:
+        self.failures += 1
+        if self.failures > settings.ingest_flush_retries:
+            print(
+                f"Dropping {len(readings)} readings after {self.failures} failed flushes"
+            )
+            self.failures = 0
+            await self.drop(readings)
+            return
+        for reading in readings:
+            self.pending[reading.device].append(reading)
+        self.size += len(readings)
+
+    async def flush(self) -> int:
+        pending, self.pending, self.size = self.pending, defaultdict(list), 0
+        readings = [reading for items in pending.values() for reading in items]
+        try:
+            await DeviceData.insert_many(readings)
+        except Exception as e:
+            inserted, rejected = insert_progress(e)
+            unsent = inserted + rejected
+            if rejected:
+                print(f"Dropping {rejected} readings rejected by the database")
+                await self.drop(readings[inserted:unsent])
+            await self.requeue(readings[unsent:])
+            self.settle(readings[:inserted])
+            await apply_readings(readings[:inserted])
+            raise
+        self.failures = 0
+        self.settle(readings)
+        await apply_readings(readings)
+        return len(readings)
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            with suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(
+                    self._wakeup.wait(), settings.ingest_flush_interval
+                )
+            self._wakeup.clear()
+            if self.size:
+                try:
+                    await self.flush()
+                except Exception as e:
+                    print(f"Error flushing ingest buffer: {e}")
+
+    def start(self) -> None:
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._stopping = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        if self.size:
+            try:
+                flushed = await self.flush()
+                print(f"Flushed {flushed} buffered readings")
+            except Exception as e:
+                print(f"Error draining ingest buffer, {self.size} readings lost: {e}")
+                pending, self.pending, self.size = self.pending, defaultdict(list), 0
+                await self.drop(
+                    [reading for items in pending.values() for reading in items]
+                )
+
+
+ingest_buffer = IngestBuffer()
+
+
+async def submit_readings(
+    readings: List[DeviceData], keys: Optional[List[Optional[ReadingKey]]] = None
+) -> None:
+    if not ingest_buffer.running:
+        await store_readings(readings)
+    elif not ingest_buffer.put(readings, keys):
+        raise HTTPException(
+            status_code=503,
+            detail="Ingest buffer full",
+            headers={"Retry-After": str(math.ceil(settings.ingest_flush_interval))},
+        )
+
+
+async def submit_unique_readings(
+    readings: List[DeviceData], keys: List[Optional[ReadingKey]]
+) -> List[bool]:
+    claimed = await claim_readings(keys)
+    try:
+        await submit_readings(
+            [reading for reading, fresh in zip(readings, claimed) if fresh],
+            [key for key, fresh in zip(keys, claimed) if fresh],
+        )
+    except Exception:
+        await release_readings([key for key, fresh in zip(keys, claimed) if fresh])
+        raise
+    return claimed
@@ -0,0 +1,161 @@
+import asyncio
+import json
+from typing import List, Optional, Tuple
+
+from fastapi import HTTPException
+from pydantic import ValidationError
+
+from app.auth import resolve_api_keys
+from app.codecs import DECODERS, MSGPACK
+from app.config import settings
+from app.idempotency import ReadingKey
+from app.ingest import submit_unique_readings
+from app.metrics import metrics
+from app.models.devices import DeviceData, DeviceDataBatchItem, DevicePrincipal
+from app.ratelimit import throttle_readings
+from app.schemas import validate_data
+
+
+def decode_packet(payload: bytes) -> Optional[DeviceDataBatchItem]:
+    payload = payload.strip()
+    try:
+        if payload.startswith(b"{"):
+            item = json.loads(payload)
+        elif MSGPACK in DECODERS:
+            item = DECODERS[MSGPACK](payload)
+        else:
+            return None
+        reading = DeviceDataBatchItem.model_validate(item)
+    except (ValueError, ValidationError):
+        return None
+    return reading if reading.api_key else None
+
+
+async def ingest_packets(items: List[DeviceDataBatchItem]) -> None:
+    devices = await resolve_api_keys(item.api_key for item in items)
+    owned: List[Tuple[DevicePrincipal, DeviceDataBatchItem]] = []
+    for item in items:
+        owner = devices.get(item.api_key)
+        if owner is None or owner.device_id != item.device_id:
+            metrics.incr("listener.rejected")
+            continue
+        owned.append((owner, item))
+    admitted = await throttle_readings([owner for owner, _ in owned])
+    readings: List[DeviceData] = []
+    keys: List[Optional[ReadingKey]] = []
+    for (owner, item), allowed in zip(owned, admitted):
+        if not allowed:
+            metrics.incr("listener.throttled")
+            continue
+        try:
+            data = validate_data(owner, item.data)
+        except ValueError:
+            metrics.incr("listener.rejected")
+            continue
+        readings.append(DeviceData(device=owner.id, data=data))
+        keys.append((owner.id, item.reading_id) if item.reading_id else None)
+    try:
+        claimed = await submit_unique_readings(readings, keys)
+    except HTTPException:
+        metrics.incr("listener.dropped", len(readings))
+        return
+    metrics.incr("listener.accepted", claimed.count(True))
+    metrics.incr("listener.duplicates", claimed.count(False))
+
+
+class DatagramListener(asyncio.DatagramProtocol):
+    def __init__(self, listener: "IngestListener") -> None:
+        self.listener = listener
+
+    def datagram_received(self, data: bytes, addr) -> None:
+        self.listener.receive(data)
+
+
+class IngestListener:
+    def __init__(self) -> None:
+        self.queue: Optional[asyncio.Queue] = None
+        self._transport: Optional[asyncio.DatagramTransport] = None
+        self._server: Optional[asyncio.Server] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    def receive(self, payload: bytes) -> None:
+        if not payload.strip():
+            return
+        item = decode_packet(payload)
+        if item is None:
+            metrics.incr("listener.rejected")
+            return
+        try:
+            self.queue.put_nowait(item)
+        except asyncio.QueueFull:
+            metrics.incr("listener.dropped")
+
+    async def handle_connection(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        try:
+            while line := await reader.readline():
+                self.receive(line)
+        except ValueError:
+            metrics.incr("listener.rejected")
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _run(self) -> None:
+        while True:
+            item = await self.queue.get()
+            if item is None:
+                return
+            items = [item]
+            while len(items) < settings.listener_batch_size and not self.queue.empty():
+                item = self.queue.get_nowait()
+                if item is None:
+                    await self.queue.put(None)
+                    break
+                items.append(item)
+            try:
+                await ingest_packets(items)
+            except Exception as e:
+                metrics.incr("listener.dropped", len(items))
+                print(f"Error storing listener readings: {e}")
+
+    async def start(self) -> None:
+        loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(settings.listener_queue_size)
+        self._task = asyncio.create_task(self._run())
+        if settings.listener_udp_port:
+            self._transport, _ = await loop.create_datagram_endpoint(
+                lambda: DatagramListener(self),
+                local_addr=(settings.listener_host, settings.listener_udp_port),
+            )
+            print(f"Listening for UDP readings on port {settings.listener_udp_port}")
+        if settings.listener_tcp_port:
+            self._server = await asyncio.start_server(
+                self.handle_connection,
+                settings.listener_host,
+                settings.listener_tcp_port,
+                limit=settings.listener_line_max,
+            )
+            print(f"Listening for TCP readings on port {settings.listener_tcp_port}")
+
+    async def stop(self) -> None:
+        if self._transport is not None:
+            self._transport.close()
+            self._transport = None
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        if self._task is not None:
+            await self.queue.put(None)
+            await self._task
+            self._task = None
+
+
+ingest_listener = IngestListener()
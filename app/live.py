@@ -0,0 +1,149 @@
+import asyncio
+import json
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import AsyncIterator, Dict, Iterable, Iterator, List, Set
+
+from beanie import PydanticObjectId
+from fastapi import Request
+
+from app.changes import ChangeStreamWatcher
+from app.config import settings
+from app.metrics import metrics
+from app.models.devices import Device, DeviceData
+from app.window import hot_window
+
+LIVE_FIELDS = {"id", "device", "created_date", "data"}
+
+
+def as_utc(dt: datetime) -> datetime:
+    return dt.replace(tzinfo=timezone.utc) if dt.tzinfo is None else dt
+
+
+class ReadingBroker:
+    def __init__(self) -> None:
+        self.subscribers: Dict[PydanticObjectId, Set[asyncio.Queue]] = defaultdict(set)
+
+    def subscribe(self, device_ids: Iterable[PydanticObjectId]) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(settings.live_queue_size)
+        for device_id in device_ids:
+            self.subscribers[device_id].add(queue)
+        metrics.incr("live.subscriptions")
+        return queue
+
+    def unsubscribe(
+        self, queue: asyncio.Queue, device_ids: Iterable[PydanticObjectId]
+    ) -> None:
+        for device_id in device_ids:
+            queues = self.subscribers.get(device_id)
+            if queues is None:
+                continue
+            queues.discard(queue)
+            if not queues:
+                del self.subscribers[device_id]
+
+    @contextmanager
+    def subscription(
+        self, device_ids: List[PydanticObjectId]
+    ) -> Iterator[asyncio.Queue]:
+        queue = self.subscribe(device_ids)
+        try:
+            yield queue
+        finally:
+            self.unsubscribe(queue, device_ids)
+
+    def publish(self, readings: Iterable[DeviceData]) -> None:
+        for reading in readings:
+            for queue in self.subscribers.get(reading.device, ()):
+                try:
+                    queue.put_nowait(reading)
+                    metrics.incr("live.published")
+                except asyncio.QueueFull:
+                    metrics.incr("live.dropped")
+
+
+reading_broker = ReadingBroker()
+
+
+def dispatch_readings(readings: List[DeviceData]) -> None:
+    hot_window.extend(readings)
+    reading_broker.publish(readings)
+
+
+def publish_readings(readings: List[DeviceData]) -> None:
+    if not settings.live_change_stream:
+        dispatch_readings(readings)
+
+
+def sse_event(reading: DeviceData) -> str:
+    payload = reading.model_dump(mode="json", by_alias=True, include=LIVE_FIELDS)
+    return f"id: {reading.id}\nevent: reading\ndata: {json.dumps(payload)}\n\n"
+
+
+async def sse_events(
+    request: Request, device_ids: List[PydanticObjectId]
+) -> AsyncIterator[str]:
+    with reading_broker.subscription(device_ids) as queue:
+        while not await request.is_disconnected():
+            try:
+                reading = await asyncio.wait_for(
+                    queue.get(), settings.live_heartbeat_interval
+                )
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            yield sse_event(reading)
+
+
+def changed_readings(
+    change: dict, watermarks: Dict[PydanticObjectId, datetime], started: datetime
+) -> List[DeviceData]:
+    document = change.get("fullDocument")
+    if not document:
+        return []
+    device_id = document["_id"]
+    since = watermarks.get(device_id, started)
+    readings = [
+        DeviceData(device=device_id, **reading)
+        for reading in document.get("recent_data", [])
+        if as_utc(reading["created_date"]) > since
+    ]
+    if readings:
+        watermarks[device_id] = max(as_utc(r.created_date) for r in readings)
+    return readings
+
+
+class ReadingChangeWatcher(ChangeStreamWatcher):
+    name = "live"
+    model = Device
+    pipeline = [
+        {"$match": {"operationType": "update"}},
+        {
+            "$match": {
+                "updateDescription.updatedFields.reading_count": {"$exists": True}
+            }
+        },
+        {
+            "$project": {
+                "fullDocument._id": 1,
+                "fullDocument.reading_count": 1,
+                "fullDocument.recent_data": 1,
+            }
+        },
+    ]
+    full_document = "updateLookup"
+
+    def reset(self) -> None:
+        self.started = datetime.now(timezone.utc)
+        self.watermarks: Dict[PydanticObjectId, datetime] = {}
+
+    def handle(self, change: dict) -> None:
+        readings = changed_readings(change, self.watermarks, self.started)
+        document = change.get("fullDocument")
+        if document:
+            hot_window.sync(document["_id"], readings, document.get("reading_count", 0))
+        reading_broker.publish(readings)
+
+
+reading_change_watcher = ReadingChangeWatcher()
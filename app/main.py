@@ -1,6 +1,7 @@
 from contextlib import asynccontextmanager
 
 from beanie import init_beanie
+from beanie.exceptions import RevisionIdWasChanged
 from fastapi import FastAPI, Request
 from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
@@ -8,19 +9,30 @@ from fastapi.responses import JSONResponse, RedirectResponse
 from motor.motor_asyncio import AsyncIOMotorClient
 
 from app.auth import pwd_context
+from app.compression import CompressionMiddleware
 from app.config import settings
-from app.models.devices import Device
-from app.models.journals import Journal
-from app.models.pages import Page
+from app.indexes import verify_indexes
+from app.ingest import ingest_buffer
+from app.listener import ingest_listener
+from app.live import reading_change_watcher
+from app.models import DOCUMENT_MODELS
 from app.models.users import Role, User
-from app.routes import device_routes, journal_routes, page_routes, user_routes
+from app.notify import notes_change_watcher
+from app.retention import retention_pruner
+from app.routes import (
+    admin_routes,
+    device_routes,
+    journal_routes,
+    page_routes,
+    user_routes,
+)
 
 
 async def init_db():
     client = AsyncIOMotorClient(settings.mongodb_uri)
     await init_beanie(
         database=client[settings.mongo_db],
-        document_models=[User, Journal, Device, Page],
+        document_models=DOCUMENT_MODELS,
     )
     return client
 
@@ -31,6 +43,11 @@ async def lifespan(app: FastAPI):
         client = await init_db()
         print(f"Connected to MongoDB. Database '{settings.mongo_db}' is ready.")
 
+        if settings.verify_indexes:
+            problems = await verify_indexes()
+            if problems:
+                raise RuntimeError(f"Index verification failed: {'; '.join(problems)}")
+
         default_user = await User.find_one(User.username == settings.initial_user_name)
 
         if not default_user:
@@ -46,11 +63,31 @@ async def lifespan(app: FastAPI):
         else:
             print(f"Default user {settings.initial_user_name} already exists")
 
+        if settings.ingest_buffer_enabled:
+            ingest_buffer.start()
+
+        if settings.listener_udp_port or settings.listener_tcp_port:
+            await ingest_listener.start()
+
+        if settings.retention_prune_enabled:
+            retention_pruner.start()
+
+        if settings.live_change_stream:
+            reading_change_watcher.start()
+
+        if settings.notes_change_stream:
+            notes_change_watcher.start()
+
         yield
     except Exception as e:
         print(f"Error during database initialization: {e}")
         raise
     finally:
+        await notes_change_watcher.stop()
+        await reading_change_watcher.stop()
+        await retention_pruner.stop()
+        await ingest_listener.stop()
+        await ingest_buffer.stop()
         if "client" in locals():
             client.close()
             print("Closed MongoDB connection")
@@ -68,7 +105,9 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(CompressionMiddleware, minimum_size=settings.compression_min_size)
 
+app.include_router(admin_routes.router, prefix="/api")
 app.include_router(device_routes.router, prefix="/api")
 app.include_router(journal_routes.router, prefix="/api")
 app.include_router(page_routes.router, prefix="/api")
@@ -88,3 +127,13 @@ async def custom_422_handler(request: Request, exc: RequestValidationError):
             "detail": "Invalid request data",
         },
     )
+
+
+@app.exception_handler(RevisionIdWasChanged)
+async def revision_conflict_handler(request: Request, exc: RevisionIdWasChanged):
+    return JSONResponse(
+        status_code=409,
+        content={
+            "detail": "Document was modified concurrently",
+        },
+    )
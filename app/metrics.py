@@ -0,0 +1,26 @@
+from collections import defaultdict
+from typing import Dict, Union
+
+Number = Union[int, float]
+
+
+class Metrics:
+    def __init__(self) -> None:
+        self.counters: Dict[str, Number] = defaultdict(int)
+        self.gauges: Dict[str, Number] = {}
+
+    def incr(self, name: str, value: Number = 1) -> None:
+        self.counters[name] += value
+
+    def gauge(self, name: str, value: Number) -> None:
+        self.gauges[name] = value
+
+    def snapshot(self) -> Dict[str, Dict[str, Number]]:
+        return {"counters": dict(self.counters), "gauges": dict(self.gauges)}
+
+    def clear(self) -> None:
+        self.counters.clear()
+        self.gauges.clear()
+
+
+metrics = Metrics()
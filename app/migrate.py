@@ -0,0 +1,74 @@
+import asyncio
+import sys
+from typing import Optional
+
+from beanie import init_beanie
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument
+
+from app.config import settings
+from app.ingest import reading_update
+from app.models import DOCUMENT_MODELS
+from app.models.devices import Device, DeviceData
+
+MIGRATION_FIELD = "migrating_data"
+
+
+async def claim_device(unfinished: bool = False) -> Optional[dict]:
+    collection = Device.get_motor_collection()
+    if unfinished:
+        return await collection.find_one(
+            {MIGRATION_FIELD: {"$exists": True}}, {MIGRATION_FIELD: 1}
+        )
+    return await collection.find_one_and_update(
+        {"data.0": {"$exists": True}},
+        {"$rename": {"data": MIGRATION_FIELD}},
+        projection={MIGRATION_FIELD: 1},
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+async def copy_readings(device: dict) -> None:
+    readings = [
+        DeviceData(device=device["_id"], **reading)
+        for reading in device[MIGRATION_FIELD]
+    ]
+    copied = set(
+        await DeviceData.get_motor_collection().distinct(
+            "_id",
+            {"device": device["_id"], "_id": {"$in": [r.id for r in readings]}},
+        )
+    )
+    missing = [reading for reading in readings if reading.id not in copied]
+    if missing:
+        await DeviceData.insert_many(missing)
+    update = reading_update(readings) if readings else {}
+    update["$unset"] = {MIGRATION_FIELD: ""}
+    await Device.get_motor_collection().update_one({"_id": device["_id"]}, update)
+
+
+async def migrate_device_data() -> int:
+    migrated = 0
+    for unfinished in (True, False):
+        while (device := await claim_device(unfinished)) is not None:
+            await copy_readings(device)
+            migrated += 1
+    return migrated
+
+
+async def main() -> int:
+    client = AsyncIOMotorClient(settings.mongodb_uri)
+    try:
+        await init_beanie(
+            database=client[settings.mongo_db],
+            document_models=DOCUMENT_MODELS,
+        )
+        migrated = await migrate_device_data()
+    finally:
+        client.close()
+    print(f"Moved embedded readings of {migrated} devices to device_data")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,21 @@
+from app.models.devices import (
+    Device,
+    DeviceData,
+    DeviceRateState,
+    DeviceReadingKey,
+    DeviceRollup,
+)
+from app.models.journals import Journal
+from app.models.pages import Page
+from app.models.users import User
+
+DOCUMENT_MODELS = [
+    User,
+    Journal,
+    Device,
+    DeviceData,
+    DeviceRateState,
+    DeviceReadingKey,
+    DeviceRollup,
+    Page,
+]
@@ -1,4 +1,6 @@
 from datetime import datetime, timezone
+from typing import Dict, Optional
+from uuid import UUID
 
 from beanie import (
     Document,
@@ -8,7 +10,9 @@ from beanie import (
     Update,
     before_event,
 )
-from pydantic import Field
+from pydantic import BaseModel, ConfigDict, Field
+from pymongo import UpdateOne
+from pymongo.results import BulkWriteResult
 
 
 class AutoTimestampedDocument(Document):
@@ -20,5 +24,32 @@ class AutoTimestampedDocument(Document):
     def update_updated_date(self):
         self.updated_date = datetime.now(timezone.utc)
 
+    @classmethod
+    async def atomic_update(
+        cls, updates: Dict[PydanticObjectId, dict]
+    ) -> Optional[BulkWriteResult]:
+        """Apply server-side updates by id in one bulk write, without loading.
+
+        Bypasses revision tracking, so hot write paths on revisioned models
+        never conflict with concurrent writers.
+        """
+        if not updates:
+            return None
+        return await cls.get_motor_collection().bulk_write(
+            [
+                UpdateOne({"_id": document_id}, update)
+                for document_id, update in updates.items()
+            ],
+            ordered=False,
+        )
+
     class Settings:
         use_revision = True
+
+
+class DocumentRevision(BaseModel):
+    model_config = ConfigDict(populate_by_name=True)
+
+    id: PydanticObjectId = Field(alias="_id")
+    revision_id: Optional[UUID] = None
+    updated_date: Optional[datetime] = None
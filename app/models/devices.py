@@ -1,42 +1,228 @@
 import secrets
 from datetime import datetime, timezone
-from typing import Any, Dict, List
+from typing import Annotated, Any, Dict, List, Literal, Optional
 
-from beanie import PydanticObjectId
+from beanie import Document, Granularity, Indexed, PydanticObjectId, TimeSeriesConfig
 from pydantic import BaseModel, ConfigDict, Field
+from pymongo import ASCENDING, IndexModel
 
-from app.models.base import AutoTimestampedDocument
+from app.config import settings
+from app.models.base import AutoTimestampedDocument, DocumentRevision
 
 
-class DeviceData(BaseModel):
+class DeviceReading(BaseModel):
     model_config = ConfigDict(populate_by_name=True)
 
     id: PydanticObjectId = Field(default_factory=PydanticObjectId, alias="_id")
     created_date: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     data: Dict[str, Any]
 
+
+class DeviceData(Document):
+    id: PydanticObjectId = Field(default_factory=PydanticObjectId, alias="_id")
+    device: PydanticObjectId
+    created_date: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    data: Dict[str, Any]
+
     class Settings:
         name = "device_data"
+        indexes = [
+            IndexModel(
+                [("device", ASCENDING), ("created_date", ASCENDING), ("_id", ASCENDING)]
+            ),
+        ]
+        timeseries = TimeSeriesConfig(
+            time_field="created_date",
+            meta_field="device",
+            granularity=Granularity.seconds,
+        )
+
+
+class DeviceRollup(Document):
+    device: PydanticObjectId
+    field: str
+    resolution: str
+    bucket: datetime
+    samples: int = Field(alias="count")
+    sum: float
+    min: float
+    max: float
+
+    class Settings:
+        name = "device_rollups"
+        indexes = [
+            IndexModel(
+                [
+                    ("device", ASCENDING),
+                    ("field", ASCENDING),
+                    ("resolution", ASCENDING),
+                    ("bucket", ASCENDING),
+                ],
+                unique=True,
+            ),
+        ]
+
+
+class DeviceReadingKey(Document):
+    device: PydanticObjectId
+    reading_id: str
+    created_date: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+    class Settings:
+        name = "device_reading_keys"
+        indexes = [
+            IndexModel([("device", ASCENDING), ("reading_id", ASCENDING)], unique=True),
+            IndexModel(
+                [("created_date", ASCENDING)],
+                expireAfterSeconds=settings.idempotency_ttl,
+            ),
+        ]
+
+
+class DeviceRateState(Document):
+    id: PydanticObjectId = Field(alias="_id")
+    tat: float
+    expires: datetime
+
+    class Settings:
+        name = "device_rate_state"
+        indexes = [
+            IndexModel([("expires", ASCENDING)], expireAfterSeconds=0),
+        ]
+
+
+class DeviceRollupPoint(BaseModel):
+    bucket: datetime
+    count: int
+    sum: float
+    min: float
+    max: float
+    mean: float
+
+
+class DeviceStats(BaseModel):
+    field: str
+    count: int
+    sum: Optional[float] = None
+    min: Optional[float] = None
+    max: Optional[float] = None
+    mean: Optional[float] = None
+    first_date: Optional[datetime] = None
+    last_date: Optional[datetime] = None
+    percentiles: Dict[str, float] = {}
+
+
+class DeviceReadingPage(BaseModel):
+    data: List[DeviceReading]
+    next_cursor: Optional[str] = None
+    has_more: bool
 
 
 class DeviceDataCreate(BaseModel):
     device_id: str
     data: Dict[str, Any]
+    reading_id: Optional[str] = Field(default=None, min_length=1, max_length=128)
+
+
+class DeviceDataBatchItem(DeviceDataCreate):
+    api_key: Optional[str] = None
+
+
+class DeviceDataBatch(BaseModel):
+    readings: List[Dict[str, Any]]
+
+
+class DeviceDataBatchResult(BaseModel):
+    index: int
+    ok: bool
+    detail: Optional[str] = None
+
+
+class DeviceDataBatchResponse(BaseModel):
+    notes: dict
+    accepted: int
+    rejected: int
+    duplicates: int = 0
+    results: List[DeviceDataBatchResult]
+
+
+class DeviceRetention(BaseModel):
+    raw_days: Optional[int] = Field(default=None, ge=1)
+    rollup_days: Optional[int] = Field(default=None, ge=1)
+
+
+class DeviceField(BaseModel):
+    type: Literal["int", "float", "bool", "str"]
+    unit: Optional[str] = None
+    required: bool = False
+
+
+class DeviceSchema(BaseModel):
+    fields: Dict[str, DeviceField]
+    extra: Literal["allow", "ignore", "forbid"] = "forbid"
+
+
+class DeviceRateLimit(BaseModel):
+    rate: float = Field(ge=0)
+    burst: int = Field(default=1, ge=1)
 
 
 class Device(AutoTimestampedDocument):
-    device_id: str
-    api_key: str = Field(default_factory=lambda: secrets.token_urlsafe(32))
+    device_id: Annotated[str, Indexed()]
+    api_key: Annotated[str, Indexed(unique=True)] = Field(
+        default_factory=lambda: secrets.token_urlsafe(32)
+    )
     notes: dict = {}
-    data: List[DeviceData] = []
+    retention: DeviceRetention = DeviceRetention()
+    data_schema: Optional[DeviceSchema] = None
+    rate_limit: Optional[DeviceRateLimit] = None
+    reading_count: int = 0
+    last_reading_date: Optional[datetime] = None
+    recent_data: List[DeviceReading] = []
 
-    class Settings:
+    class Settings(AutoTimestampedDocument.Settings):
         name = "devices"
 
 
+class DevicePrincipal(BaseModel):
+    model_config = ConfigDict(populate_by_name=True)
+
+    id: PydanticObjectId = Field(alias="_id")
+    device_id: str
+    notes: dict = {}
+    data_schema: Optional[DeviceSchema] = None
+    rate_limit: Optional[DeviceRateLimit] = None
+
+
+class DeviceRevision(DocumentRevision):
+    reading_count: int = 0
+    last_reading_date: Optional[datetime] = None
+
+
+class DeviceNotes(DocumentRevision):
+    notes: dict = {}
+
+
+class DeviceKeyLookup(DevicePrincipal):
+    api_key: str
+
+
+class DeviceLatest(BaseModel):
+    model_config = ConfigDict(populate_by_name=True)
+
+    id: PydanticObjectId = Field(alias="_id")
+    device_id: str
+    reading_count: int = 0
+    last_reading_date: Optional[datetime] = None
+    recent_data: List[DeviceReading] = []
+
+
 class DeviceCreate(BaseModel):
     device_id: str
     notes: dict = {}
+    retention: DeviceRetention = DeviceRetention()
+    data_schema: Optional[DeviceSchema] = None
+    rate_limit: Optional[DeviceRateLimit] = None
 
 
 class DevicePublic(BaseModel):
@@ -45,4 +231,16 @@ class DevicePublic(BaseModel):
     updated_date: datetime
     device_id: str
     notes: dict
-    data: List[DeviceData]
+    data: List[DeviceReading]
+
+
+class DeviceSummary(BaseModel):
+    id: PydanticObjectId
+    created_date: datetime
+    updated_date: datetime
+    device_id: str
+    notes: dict
+    retention: DeviceRetention
+    reading_count: int
+    last_reading_date: Optional[datetime] = None
+    data: List[DeviceReading] = []
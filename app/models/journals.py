@@ -1,7 +1,7 @@
 from datetime import datetime
-from typing import List
+from typing import Annotated, List
 
-from beanie import Link, PydanticObjectId
+from beanie import Indexed, Link, PydanticObjectId
 from pydantic import BaseModel, Field, field_validator
 
 from app.models.base import AutoTimestampedDocument
@@ -31,12 +31,12 @@ class Entry(BaseModel):
 
 
 class Journal(AutoTimestampedDocument):
-    title: str
+    title: Annotated[str, Indexed()]
     author: Link[User]
     description: str
     entries: List[Entry]
 
-    class Settings:
+    class Settings(AutoTimestampedDocument.Settings):
         name = "journals"
 
 
@@ -1,4 +1,6 @@
-from beanie import Link
+from typing import Annotated
+
+from beanie import Indexed, Link
 from pydantic import BaseModel
 
 from app.models.base import AutoTimestampedDocument
@@ -7,10 +9,10 @@ from app.models.users import User
 
 class Page(AutoTimestampedDocument):
     author: Link[User]
-    title: str
+    title: Annotated[str, Indexed()]
     body: str
 
-    class Settings:
+    class Settings(AutoTimestampedDocument.Settings):
         name = "pages"
 
 
@@ -14,12 +14,12 @@ class Role(Enum):
 
 
 class User(AutoTimestampedDocument):
-    username: str
+    username: Annotated[str, Indexed(unique=True)]
     email: Annotated[EmailStr, Indexed(unique=True)]
     password: str
     role: Role = Role.AUTHENTICATED
 
-    class Settings:
+    class Settings(AutoTimestampedDocument.Settings):
         name = "users"
 
 
@@ -34,3 +34,9 @@ class UserShow(BaseModel):
     id: PydanticObjectId
     username: str
     role: Role
+
+
+class TokenClaims(BaseModel):
+    sub: str
+    uid: PydanticObjectId
+    role: Role
@@ -0,0 +1,67 @@
+import asyncio
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict, Iterator, Set
+
+from beanie import PydanticObjectId
+
+from app.changes import ChangeStreamWatcher
+from app.metrics import metrics
+from app.models.devices import Device
+
+
+class Waiters:
+    def __init__(self) -> None:
+        self.events: Dict[PydanticObjectId, Set[asyncio.Event]] = defaultdict(set)
+
+    @contextmanager
+    def waiting(self, document_id: PydanticObjectId) -> Iterator[asyncio.Event]:
+        event = asyncio.Event()
+        self.events[document_id].add(event)
+        try:
+            yield event
+        finally:
+            events = self.events.get(document_id)
+            if events is not None:
+                events.discard(event)
+                if not events:
+                    del self.events[document_id]
+
+    def notify(self, document_id: PydanticObjectId) -> None:
+        for event in self.events.get(document_id, ()):
+            event.set()
+
+
+notes_waiters = Waiters()
+
+
+async def wait_for_change(event: asyncio.Event, timeout: float) -> bool:
+    try:
+        await asyncio.wait_for(event.wait(), timeout)
+    except asyncio.TimeoutError:
+        return False
+    event.clear()
+    metrics.incr("notes.wakeups")
+    return True
+
+
+class NotesChangeWatcher(ChangeStreamWatcher):
+    name = "notes"
+    model = Device
+    pipeline = [
+        {
+            "$match": {
+                "$or": [
+                    {"operationType": {"$in": ["replace", "delete"]}},
+                    {"updateDescription.updatedFields.revision_id": {"$exists": True}},
+                ]
+            }
+        },
+        {"$project": {"documentKey": 1}},
+    ]
+
+    def handle(self, change: dict) -> None:
+        notes_waiters.notify(change["documentKey"]["_id"])
+
+
+notes_change_watcher = NotesChangeWatcher()
@@ -0,0 +1,124 @@
+import math
+import time
+from collections import OrderedDict, defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from beanie import PydanticObjectId
+from fastapi import Depends, HTTPException
+from pymongo.errors import DuplicateKeyError
+
+from app.auth import validate_api_key
+from app.config import settings
+from app.metrics import metrics
+from app.models.devices import DevicePrincipal, DeviceRateState
+
+SHARED_ATTEMPTS = 5
+
+
+def device_limits(device: DevicePrincipal) -> Tuple[float, int]:
+    if device.rate_limit is not None:
+        return device.rate_limit.rate, device.rate_limit.burst
+    return settings.ingest_rate, settings.ingest_burst
+
+
+def admit(
+    tat: Optional[float], now: float, rate: float, burst: int, cost: int = 1
+) -> Tuple[float, int, float]:
+    interval = 1 / rate
+    tat = max(tat or now, now)
+    available = math.floor((now + burst * interval - tat) / interval + 1e-9)
+    admitted = max(0, min(cost, available))
+    tat += admitted * interval
+    if admitted == cost:
+        return tat, admitted, 0.0
+    return tat, admitted, tat + interval - now - burst * interval
+
+
+class RateLimiter:
+    def __init__(self) -> None:
+        self.tats: OrderedDict[PydanticObjectId, float] = OrderedDict()
+
+    def acquire(
+        self, device_id: PydanticObjectId, rate: float, burst: int, cost: int = 1
+    ) -> Tuple[int, float]:
+        tat, admitted, wait = admit(
+            self.tats.get(device_id), time.monotonic(), rate, burst, cost
+        )
+        self.tats[device_id] = tat
+        self.tats.move_to_end(device_id)
+        while len(self.tats) > settings.ingest_rate_max_devices:
+            self.tats.popitem(last=False)
+        return admitted, wait
+
+    async def acquire_shared(
+        self, device_id: PydanticObjectId, rate: float, burst: int, cost: int = 1
+    ) -> Tuple[int, float]:
+        collection = DeviceRateState.get_motor_collection()
+        for _ in range(SHARED_ATTEMPTS):
+            state = await collection.find_one({"_id": device_id})
+            previous = state["tat"] if state is not None else None
+            now = time.time()
+            tat, admitted, wait = admit(previous, now, rate, burst, cost)
+            if not admitted:
+                return admitted, wait
+            update = {
+                "tat": tat,
+                "expires": datetime.now(timezone.utc) + timedelta(seconds=tat - now),
+            }
+            if state is None:
+                try:
+                    await collection.insert_one({"_id": device_id, **update})
+                except DuplicateKeyError:
+                    continue
+                return admitted, wait
+            result = await collection.update_one(
+                {"_id": device_id, "tat": previous}, {"$set": update}
+            )
+            if result.modified_count:
+                return admitted, wait
+        return 0, 1 / rate
+
+    def clear(self) -> None:
+        self.tats.clear()
+
+
+rate_limiter = RateLimiter()
+
+
+async def throttle(device: DevicePrincipal, cost: int = 1) -> Tuple[int, float]:
+    rate, burst = device_limits(device)
+    if rate <= 0:
+        return cost, 0.0
+    if settings.ingest_rate_shared:
+        admitted, wait = await rate_limiter.acquire_shared(device.id, rate, burst, cost)
+    else:
+        admitted, wait = rate_limiter.acquire(device.id, rate, burst, cost)
+    metrics.incr("rate_limit.admitted", admitted)
+    metrics.incr("rate_limit.throttled", cost - admitted)
+    return admitted, wait
+
+
+async def throttle_readings(owners: List[DevicePrincipal]) -> List[bool]:
+    positions: Dict[PydanticObjectId, List[int]] = defaultdict(list)
+    for position, owner in enumerate(owners):
+        positions[owner.id].append(position)
+    admitted = [True] * len(owners)
+    for device_positions in positions.values():
+        allowed, _ = await throttle(owners[device_positions[0]], len(device_positions))
+        for position in device_positions[allowed:]:
+            admitted[position] = False
+    return admitted
+
+
+async def rate_limited_device(
+    device: DevicePrincipal = Depends(validate_api_key),
+) -> DevicePrincipal:
+    admitted, wait = await throttle(device)
+    if not admitted:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many requests",
+            headers={"Retry-After": str(math.ceil(wait))},
+        )
+    return device
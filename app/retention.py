@@ -0,0 +1,137 @@
+import asyncio
+from contextlib import suppress
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from beanie import PydanticObjectId
+from pydantic import BaseModel, ConfigDict, Field
+
+from app.config import settings
+from app.metrics import metrics
+from app.models.devices import Device, DeviceData, DeviceRetention, DeviceRollup
+from app.window import hot_window
+
+
+class DeviceRetentionLookup(BaseModel):
+    model_config = ConfigDict(populate_by_name=True)
+
+    id: PydanticObjectId = Field(alias="_id")
+    retention: DeviceRetention = DeviceRetention()
+
+
+def retention_days(retention: DeviceRetention) -> Tuple[int, int]:
+    return (
+        retention.raw_days or settings.device_data_retention_days,
+        retention.rollup_days or settings.device_rollup_retention_days,
+    )
+
+
+def retention_filter() -> dict:
+    if settings.device_data_retention_days or settings.device_rollup_retention_days:
+        return {}
+    return {
+        "$or": [
+            {"retention.raw_days": {"$gte": 1}},
+            {"retention.rollup_days": {"$gte": 1}},
+        ]
+    }
+
+
+async def prune_device(device: DeviceRetentionLookup, now: datetime) -> Tuple[int, int]:
+    raw_days, rollup_days = retention_days(device.retention)
+    raw_pruned = rollups_pruned = 0
+    if raw_days:
+        cutoff = now - timedelta(days=raw_days)
+        result = await DeviceData.get_motor_collection().delete_many(
+            {"device": device.id, "created_date": {"$lt": cutoff}}
+        )
+        raw_pruned = result.deleted_count
+    if raw_pruned:
+        await Device.atomic_update(
+            {
+                device.id: {
+                    "$inc": {"reading_count": -raw_pruned},
+                    "$pull": {"recent_data": {"created_date": {"$lt": cutoff}}},
+                }
+            }
+        )
+        hot_window.pop(device.id)
+    if rollup_days:
+        result = await DeviceRollup.get_motor_collection().delete_many(
+            {"device": device.id, "bucket": {"$lt": now - timedelta(days=rollup_days)}}
+        )
+        rollups_pruned = result.deleted_count
+    return raw_pruned, rollups_pruned
+
+
+async def prune_expired(now: Optional[datetime] = None) -> Dict[str, int]:
+    now = now or datetime.now(timezone.utc)
+    totals = {"devices": 0, "readings": 0, "rollups": 0}
+    batch: List[DeviceRetentionLookup] = []
+
+    async def prune_batch() -> None:
+        for raw_pruned, rollups_pruned in await asyncio.gather(
+            *(prune_device(device, now) for device in batch)
+        ):
+            totals["readings"] += raw_pruned
+            totals["rollups"] += rollups_pruned
+        totals["devices"] += len(batch)
+        batch.clear()
+
+    async for device in Device.find(
+        retention_filter(), projection_model=DeviceRetentionLookup
+    ):
+        batch.append(device)
+        if len(batch) >= settings.retention_prune_batch:
+            await prune_batch()
+    if batch:
+        await prune_batch()
+
+    metrics.incr("retention.runs")
+    metrics.incr("retention.readings_pruned", totals["readings"])
+    metrics.incr("retention.rollups_pruned", totals["rollups"])
+    metrics.gauge("retention.last_run", now.timestamp())
+    return totals
+
+
+class RetentionPruner:
+    def __init__(self) -> None:
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            try:
+                totals = await prune_expired()
+                if totals["readings"] or totals["rollups"]:
+                    print(
+                        f"Pruned {totals['readings']} readings and "
+                        f"{totals['rollups']} rollups past retention"
+                    )
+            except Exception as e:
+                metrics.incr("retention.errors")
+                print(f"Error pruning expired readings: {e}")
+            with suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(
+                    self._wakeup.wait(), settings.retention_prune_interval
+                )
+
+    def start(self) -> None:
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._stopping = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+
+
+retention_pruner = RetentionPruner()
@@ -0,0 +1,72 @@
+import asyncio
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Literal, Tuple
+
+from beanie import PydanticObjectId
+
+from app.models.devices import DeviceData, DeviceRollup
+
+Resolution = Literal["1m", "1h", "1d"]
+
+RESOLUTIONS: Dict[str, int] = {"1m": 60, "1h": 3600, "1d": 86400}
+
+RollupKey = Tuple[PydanticObjectId, str, str, datetime]
+
+
+def is_numeric(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def bucket_start(created_date: datetime, seconds: int) -> datetime:
+    if created_date.tzinfo is None:
+        created_date = created_date.replace(tzinfo=timezone.utc)
+    timestamp = int(created_date.timestamp())
+    return datetime.fromtimestamp(timestamp - timestamp % seconds, tz=timezone.utc)
+
+
+def aggregate_readings(readings: List[DeviceData]) -> Dict[RollupKey, dict]:
+    rollups: Dict[RollupKey, dict] = defaultdict(
+        lambda: {"count": 0, "sum": 0.0, "min": None, "max": None}
+    )
+    for reading in readings:
+        for field, value in reading.data.items():
+            if not is_numeric(value):
+                continue
+            for resolution, seconds in RESOLUTIONS.items():
+                bucket = bucket_start(reading.created_date, seconds)
+                rollup = rollups[(reading.device, field, resolution, bucket)]
+                rollup["count"] += 1
+                rollup["sum"] += value
+                rollup["min"] = (
+                    value if rollup["min"] is None else min(rollup["min"], value)
+                )
+                rollup["max"] = (
+                    value if rollup["max"] is None else max(rollup["max"], value)
+                )
+    return rollups
+
+
+async def update_rollups(readings: List[DeviceData]) -> None:
+    collection = DeviceRollup.get_motor_collection()
+    await asyncio.gather(
+        *(
+            collection.update_one(
+                {
+                    "device": device,
+                    "field": field,
+                    "resolution": resolution,
+                    "bucket": bucket,
+                },
+                {
+                    "$inc": {"count": rollup["count"], "sum": rollup["sum"]},
+                    "$min": {"min": rollup["min"]},
+                    "$max": {"max": rollup["max"]},
+                },
+                upsert=True,
+            )
+            for (device, field, resolution, bucket), rollup in aggregate_readings(
+                readings
+            ).items()
+        )
+    )
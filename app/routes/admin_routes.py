@@ -0,0 +1,18 @@
+from fastapi import APIRouter, Depends
+
+from app.auth import require_role
+from app.metrics import metrics
+from app.models.users import Role, TokenClaims
+from app.retention import prune_expired
+
+router = APIRouter()
+
+
+@router.get("/admin/metrics", response_model=dict)
+async def get_metrics(claims: TokenClaims = Depends(require_role(Role.ADMIN))):
+    return metrics.snapshot()
+
+
+@router.post("/admin/retention/prune", response_model=dict)
+async def prune_retention(claims: TokenClaims = Depends(require_role(Role.ADMIN))):
+    return await prune_expired()
@@ -1,25 +1,170 @@
-from typing import Optional
+import asyncio
+import base64
+import json
+import re
+from contextlib import nullcontext
+from datetime import datetime, timezone
+from typing import AsyncIterator, List, Literal, Optional, Set, Tuple
 
 from beanie import PydanticObjectId
-from fastapi import APIRouter, Depends, HTTPException, Query
+from bson.errors import InvalidId
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from motor.core import AgnosticCollection
+from motor.motor_asyncio import AsyncIOMotorCommandCursor, AsyncIOMotorCursor
+from pydantic import ValidationError
+from pymongo.errors import ExecutionTimeout, OperationFailure
 
-from app.auth import require_role, validate_api_key
+from app.auth import forget_api_key, require_role, resolve_api_keys, validate_api_key
+from app.codecs import BinaryBodyRoute, encoded_response
+from app.config import settings
+from app.etag import document_tag, etag_matches, not_modified
+from app.export import EXPORT_BATCH_SIZE, columnar_rows, csv_rows, ndjson_rows, pa
+from app.idempotency import ReadingKey
+from app.ingest import submit_unique_readings
+from app.live import sse_events
+from app.metrics import metrics
 from app.models.devices import (
     Device,
     DeviceCreate,
     DeviceData,
+    DeviceDataBatch,
+    DeviceDataBatchItem,
+    DeviceDataBatchResponse,
+    DeviceDataBatchResult,
     DeviceDataCreate,
+    DeviceLatest,
+    DeviceNotes,
+    DevicePrincipal,
     DevicePublic,
+    DeviceReading,
+    DeviceReadingPage,
+    DeviceRevision,
+    DeviceRollup,
+    DeviceRollupPoint,
+    DeviceStats,
+    DeviceSummary,
 )
-from app.models.users import Role, User
+from app.models.users import Role, TokenClaims
+from app.notify import notes_waiters, wait_for_change
+from app.ratelimit import rate_limited_device, throttle_readings
+from app.rollups import RESOLUTIONS, Resolution, bucket_start
+from app.schemas import validate_data
+from app.window import hot_window, query_latest
 
-router = APIRouter()
+router = APIRouter(route_class=BinaryBodyRoute)
+
+
+async def latest_readings(
+    device: Device, data_limit: int, semaphore: Optional[asyncio.Semaphore] = None
+) -> List[DeviceReading]:
+    if data_limit <= 0:
+        return []
+    if not hot_window.covers(data_limit) and len(device.recent_data) >= data_limit:
+        return device.recent_data[-data_limit:]
+    async with semaphore or nullcontext():
+        if hot_window.covers(data_limit):
+            return await hot_window.latest(
+                device.id, data_limit, device.reading_count, device.last_reading_date
+            )
+        return await query_latest(device.id, data_limit)
+
+
+async def device_latest_readings(
+    device: DeviceLatest, data_limit: int, semaphore: asyncio.Semaphore
+) -> str:
+    readings = hot_window.peek(
+        device.id, data_limit, device.reading_count, device.last_reading_date
+    )
+    if readings is None:
+        recent_data = device.recent_data
+        if len(recent_data) >= data_limit or 0 < device.reading_count <= len(
+            recent_data
+        ):
+            readings = recent_data[-data_limit:] if data_limit else []
+        else:
+            async with semaphore:
+                if hot_window.covers(data_limit):
+                    readings = await hot_window.latest(
+                        device.id,
+                        data_limit,
+                        device.reading_count,
+                        device.last_reading_date,
+                    )
+                else:
+                    readings = await query_latest(device.id, data_limit)
+    return json.dumps(
+        {
+            "_id": str(device.id),
+            "device_id": device.device_id,
+            "data": [
+                reading.model_dump(mode="json", by_alias=True) for reading in readings
+            ],
+        }
+    )
+
+
+async def latest_lines(
+    cursor: AsyncIOMotorCommandCursor, data_limit: int
+) -> AsyncIterator[str]:
+    semaphore = asyncio.Semaphore(settings.latest_concurrency)
+    tasks: Set[asyncio.Task] = set()
+    try:
+        async for document in cursor:
+            task = asyncio.ensure_future(
+                device_latest_readings(DeviceLatest(**document), data_limit, semaphore)
+            )
+            tasks.add(task)
+            for done in [task for task in tasks if task.done()]:
+                tasks.discard(done)
+                yield done.result() + "\n"
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done + "\n"
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+def recent_data_projection(projection: dict, data_limit: int) -> dict:
+    if data_limit and not hot_window.covers(data_limit):
+        projection["recent_data"] = {"$slice": ["$recent_data", -data_limit]}
+    return projection
+
+
+def encode_cursor(reading: DeviceReading) -> str:
+    created_date = reading.created_date
+    if created_date.tzinfo is None:
+        created_date = created_date.replace(tzinfo=timezone.utc)
+    position = f"{created_date.isoformat()}|{reading.id}"
+    return base64.urlsafe_b64encode(position.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, PydanticObjectId]:
+    try:
+        position = base64.urlsafe_b64decode(cursor.encode()).decode()
+        created_date, reading_id = position.split("|")
+        return datetime.fromisoformat(created_date), PydanticObjectId(reading_id)
+    except (ValueError, InvalidId):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def readings_filter(
+    device_id: PydanticObjectId, start: Optional[datetime], end: Optional[datetime]
+) -> List[dict]:
+    conditions: List[dict] = [{"device": device_id}]
+    created_date: dict = {}
+    if start is not None:
+        created_date["$gte"] = start
+    if end is not None:
+        created_date["$lt"] = end
+    if created_date:
+        conditions.append({"created_date": created_date})
+    return conditions
 
 
 @router.post("/devices", response_model=Device)
 async def register_device(
-    device: DeviceCreate, user: User = Depends(require_role(Role.ADMIN))
+    device: DeviceCreate, claims: TokenClaims = Depends(require_role(Role.ADMIN))
 ):
     new_device = Device(**device.model_dump())
     await new_device.insert()
@@ -28,57 +173,460 @@ async def register_device(
 
 @router.post("/devices/data", response_model=dict)
 async def post_device_data(
-    device_data: DeviceDataCreate, device: Device = Depends(validate_api_key)
+    request: Request,
+    response: Response,
+    device_data: DeviceDataCreate,
+    device: DevicePrincipal = Depends(rate_limited_device),
+    idempotency_key: Optional[str] = Header(None, max_length=128),
 ):
     if device.device_id != device_data.device_id:
         raise HTTPException(status_code=401, detail="Mismatched device ID")
 
-    device.data.append(DeviceData(data=device_data.data))
-    await device.save()
-    return {"notes": device.notes}
+    try:
+        data = validate_data(device, device_data.data)
+    except ValueError:
+        raise HTTPException(
+            status_code=422, detail="Reading does not match device schema"
+        )
+    reading_id = device_data.reading_id or idempotency_key
+    (fresh,) = await submit_unique_readings(
+        [DeviceData(device=device.id, data=data)],
+        [(device.id, reading_id) if reading_id else None],
+    )
+    if not fresh:
+        response.headers["Idempotent-Replayed"] = "true"
+    return encoded_response(request, {"notes": device.notes}, response)
+
+
+@router.post("/devices/data/batch", response_model=DeviceDataBatchResponse)
+async def post_device_data_batch(
+    request: Request,
+    batch: DeviceDataBatch,
+    device: DevicePrincipal = Depends(validate_api_key),
+):
+    if len(batch.readings) > settings.device_data_batch_max:
+        raise HTTPException(status_code=413, detail="Too many readings")
+
+    devices = await resolve_api_keys(
+        item["api_key"]
+        for item in batch.readings
+        if isinstance(item.get("api_key"), str)
+    )
+
+    results: List[DeviceDataBatchResult] = [
+        DeviceDataBatchResult(index=index, ok=False)
+        for index in range(len(batch.readings))
+    ]
+    owned: List[Tuple[int, DevicePrincipal, DeviceDataBatchItem]] = []
+    for index, item in enumerate(batch.readings):
+        try:
+            reading = DeviceDataBatchItem.model_validate(item)
+        except ValidationError:
+            results[index].detail = "Invalid reading"
+            continue
+        owner = devices.get(reading.api_key) if reading.api_key else device
+        if owner is None:
+            results[index].detail = "Invalid API key"
+        elif owner.device_id != reading.device_id:
+            results[index].detail = "Mismatched device ID"
+        else:
+            owned.append((index, owner, reading))
+
+    admitted = await throttle_readings([owner for _, owner, _ in owned])
+    readings: List[DeviceData] = []
+    keys: List[Optional[ReadingKey]] = []
+    accepted: List[DeviceDataBatchResult] = []
+    for (index, owner, reading), allowed in zip(owned, admitted):
+        if not allowed:
+            results[index].detail = "Rate limited"
+            continue
+        try:
+            data = validate_data(owner, reading.data)
+        except ValueError:
+            results[index].detail = "Reading does not match device schema"
+            continue
+        readings.append(DeviceData(device=owner.id, data=data))
+        keys.append((owner.id, reading.reading_id) if reading.reading_id else None)
+        results[index].ok = True
+        accepted.append(results[index])
+
+    claimed = await submit_unique_readings(readings, keys)
+    for result, fresh in zip(accepted, claimed):
+        if not fresh:
+            result.detail = "Duplicate reading"
+    duplicates = claimed.count(False)
+    return encoded_response(
+        request,
+        DeviceDataBatchResponse(
+            notes=device.notes,
+            accepted=len(readings) - duplicates,
+            rejected=len(results) - len(readings),
+            duplicates=duplicates,
+            results=results,
+        ),
+    )
+
+
+@router.get("/devices/latest")
+async def get_latest_readings(
+    device_id: List[PydanticObjectId] = Query([], description="Devices to include"),
+    prefix: Optional[str] = Query(
+        None, description="Include devices whose device_id starts with this"
+    ),
+    data_limit: int = Query(24, ge=0, le=1000),
+):
+    if device_id:
+        if len(device_id) > settings.latest_max_devices:
+            raise HTTPException(
+                status_code=400,
+                detail=f"At most {settings.latest_max_devices} devices per request",
+            )
+        match: dict = {"_id": {"$in": device_id}}
+    elif prefix:
+        match = {"device_id": {"$regex": f"^{re.escape(prefix)}"}}
+    else:
+        raise HTTPException(status_code=400, detail="Provide device_id or prefix")
+    projection: dict = {"device_id": 1, "reading_count": 1, "last_reading_date": 1}
+    if data_limit:
+        projection["recent_data"] = {"$slice": ["$recent_data", -data_limit]}
+    pipeline = [
+        {"$match": match},
+        {"$sort": {"_id": 1}},
+        {"$limit": settings.latest_max_devices},
+        {"$project": projection},
+    ]
+    collection: AgnosticCollection = Device.get_motor_collection()
+    return StreamingResponse(
+        latest_lines(collection.aggregate(pipeline), data_limit),
+        media_type="application/x-ndjson",
+    )
+
+
+@router.get("/devices/stream")
+async def stream_device_data(
+    request: Request,
+    device_id: List[PydanticObjectId] = Query(
+        ..., description="Devices to receive new readings for"
+    ),
+):
+    device_ids = list(dict.fromkeys(device_id))
+    if len(device_ids) > settings.live_max_devices:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.live_max_devices} devices per stream",
+        )
+    return StreamingResponse(
+        sse_events(request, device_ids),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def device_tag(device, data_limit: int) -> str:
+    return document_tag(
+        device, device.reading_count, device.last_reading_date, data_limit
+    )
 
 
 @router.get("/devices/{device_id}", response_model=DevicePublic)
 async def get_device(
+    request: Request,
+    response: Response,
     device_id: PydanticObjectId,
     data_limit: Optional[int] = Query(
         24, description="Limit the number of data points returned"
     ),
 ):
     data_limit = max(0, data_limit) if data_limit is not None else 24
+    cached = await not_modified(
+        request,
+        Device,
+        device_id,
+        lambda device: device_tag(device, data_limit),
+        DeviceRevision,
+    )
+    if cached:
+        return cached
     pipeline = [
         {"$match": {"_id": device_id}},
         {
-            "$project": {
-                "id": 1,
-                "created_date": 1,
-                "updated_date": 1,
-                "device_id": 1,
-                "notes": 1,
-                "data": {"$slice": ["$data", -data_limit]},
-            }
+            "$project": recent_data_projection(
+                {
+                    "id": 1,
+                    "revision_id": 1,
+                    "created_date": 1,
+                    "updated_date": 1,
+                    "device_id": 1,
+                    "notes": 1,
+                    "reading_count": 1,
+                    "last_reading_date": 1,
+                },
+                data_limit,
+            )
         },
     ]
     collection: AgnosticCollection = Device.get_motor_collection()
     result = await collection.aggregate(pipeline).to_list(length=1)
     if not result:
         raise HTTPException(status_code=404, detail="Device not found")
-    return Device(**result[0])
+    device = Device(**result[0])
+    data = await latest_readings(device, data_limit)
+    response.headers["ETag"] = device_tag(device, data_limit)
+    return DevicePublic(**device.model_dump(), data=data)
 
 
 @router.get("/devices/{device_id}/notes", response_model=dict)
-async def get_device_notes(device_id: PydanticObjectId):
-    device = await Device.get(device_id)
+async def get_device_notes(
+    request: Request, response: Response, device_id: PydanticObjectId
+):
+    cached = await not_modified(request, Device, device_id)
+    if cached:
+        return cached
+    device = await Device.find_one(Device.id == device_id, projection_model=DeviceNotes)
     if device is None:
         raise HTTPException(status_code=404, detail="Device not found")
+    response.headers["ETag"] = document_tag(device)
     return {"notes": device.notes}
 
 
+@router.get("/devices/{device_id}/notes/poll", response_model=dict)
+async def poll_device_notes(
+    request: Request,
+    response: Response,
+    device_id: PydanticObjectId,
+    timeout: float = Query(
+        settings.notes_poll_timeout,
+        gt=0,
+        le=settings.notes_poll_timeout_max,
+        description="Seconds to wait for the notes to change",
+    ),
+):
+    metrics.incr("notes.long_polls")
+    deadline = asyncio.get_running_loop().time() + timeout
+    with notes_waiters.waiting(device_id) as changed:
+        while True:
+            device = await Device.find_one(
+                Device.id == device_id, projection_model=DeviceNotes
+            )
+            if device is None:
+                raise HTTPException(status_code=404, detail="Device not found")
+            etag = document_tag(device)
+            if not etag_matches(request, etag):
+                break
+            remaining = deadline - asyncio.get_running_loop().time()
+            if remaining <= 0 or not await wait_for_change(changed, remaining):
+                return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    return {"notes": device.notes}
+
+
+@router.get("/devices/{device_id}/readings", response_model=DeviceReadingPage)
+async def get_device_readings(
+    device_id: PydanticObjectId,
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
+    since: Optional[str] = Query(
+        None, description="next_cursor of a previous page, returns readings after it"
+    ),
+    limit: int = Query(100, ge=1, le=1000),
+):
+    conditions = readings_filter(device_id, start, end)
+    if since is not None:
+        after, reading_id = decode_cursor(since)
+        conditions.append(
+            {
+                "$or": [
+                    {"created_date": {"$gt": after}},
+                    {"created_date": after, "_id": {"$gt": reading_id}},
+                ]
+            }
+        )
+    readings = (
+        await DeviceData.find({"$and": conditions})
+        .sort(+DeviceData.created_date, +DeviceData.id)
+        .limit(limit + 1)
+        .project(DeviceReading)
+        .to_list()
+    )
+    has_more = len(readings) > limit
+    readings = readings[:limit]
+    return DeviceReadingPage(
+        data=readings,
+        next_cursor=encode_cursor(readings[-1]) if readings else since,
+        has_more=has_more,
+    )
+
+
+def valid_field_path(name: str) -> bool:
+    return all(part and not part.startswith("$") for part in name.split("."))
+
+
+def export_fields(fields: Optional[str]) -> Optional[List[str]]:
+    if not fields:
+        return None
+    names = [name.strip() for name in fields.split(",") if name.strip()]
+    if not all(valid_field_path(name) for name in names):
+        raise HTTPException(status_code=400, detail="Invalid field name")
+    return names
+
+
+def export_cursor(
+    device_id: PydanticObjectId,
+    start: Optional[datetime],
+    end: Optional[datetime],
+    names: Optional[List[str]],
+) -> AsyncIOMotorCursor:
+    projection = {"created_date": 1, "data": 1}
+    if names is not None:
+        projection = {"created_date": 1, **{f"data.{name}": 1 for name in names}}
+    return DeviceData.get_motor_collection().find(
+        {"$and": readings_filter(device_id, start, end)},
+        projection,
+        sort=[("created_date", 1), ("_id", 1)],
+        batch_size=EXPORT_BATCH_SIZE,
+    )
+
+
+@router.get("/devices/{device_id}/export")
+async def export_device_data(
+    device_id: PydanticObjectId,
+    export_format: Literal["ndjson", "csv"] = Query("ndjson", alias="format"),
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
+    fields: Optional[str] = Query(
+        None, description="Comma separated data fields, defaults to all fields"
+    ),
+):
+    names = export_fields(fields)
+    cursor = export_cursor(device_id, start, end, names)
+    if export_format == "csv":
+        content, media_type = csv_rows(cursor, names), "text/csv"
+    else:
+        content, media_type = ndjson_rows(cursor), "application/x-ndjson"
+    return StreamingResponse(
+        content,
+        media_type=media_type,
+        headers={
+            "Content-Disposition": f'attachment; filename="{device_id}.{export_format}"'
+        },
+    )
+
+
+@router.get("/devices/{device_id}/export/columnar")
+async def export_device_data_columnar(
+    device_id: PydanticObjectId,
+    export_format: Literal["arrow", "parquet"] = Query("arrow", alias="format"),
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
+    fields: Optional[str] = Query(
+        None, description="Comma separated data fields, defaults to all fields"
+    ),
+):
+    if pa is None:
+        raise HTTPException(status_code=501, detail="Columnar export requires pyarrow")
+    names = export_fields(fields)
+    cursor = export_cursor(device_id, start, end, names)
+    if export_format == "parquet":
+        media_type, extension = "application/vnd.apache.parquet", "parquet"
+    else:
+        media_type, extension = "application/vnd.apache.arrow.stream", "arrows"
+    return StreamingResponse(
+        columnar_rows(cursor, names, export_format),
+        media_type=media_type,
+        headers={
+            "Content-Disposition": f'attachment; filename="{device_id}.{extension}"'
+        },
+    )
+
+
+@router.get("/devices/{device_id}/series", response_model=List[DeviceRollupPoint])
+async def get_device_series(
+    device_id: PydanticObjectId,
+    field: str,
+    resolution: Resolution = "1h",
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
+    limit: int = Query(1000, ge=1, le=10000),
+):
+    query: dict = {"device": device_id, "field": field, "resolution": resolution}
+    bucket: dict = {}
+    if start is not None:
+        bucket["$gte"] = bucket_start(start, RESOLUTIONS[resolution])
+    if end is not None:
+        bucket["$lt"] = end
+    if bucket:
+        query["bucket"] = bucket
+    rollups = (
+        await DeviceRollup.find(query).sort(+DeviceRollup.bucket).limit(limit).to_list()
+    )
+    return [
+        DeviceRollupPoint(
+            bucket=rollup.bucket,
+            count=rollup.samples,
+            sum=rollup.sum,
+            min=rollup.min,
+            max=rollup.max,
+            mean=rollup.sum / rollup.samples,
+        )
+        for rollup in rollups
+    ]
+
+
+@router.get("/devices/{device_id}/stats", response_model=DeviceStats)
+async def get_device_stats(
+    device_id: PydanticObjectId,
+    field: str,
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
+    percentile: List[float] = Query([], description="Percentiles between 0 and 1"),
+):
+    if not valid_field_path(field):
+        raise HTTPException(status_code=400, detail="Invalid field name")
+    if any(not 0 <= p <= 1 for p in percentile):
+        raise HTTPException(
+            status_code=400, detail="Percentiles must be between 0 and 1"
+        )
+    value = f"$data.{field}"
+    group: dict = {
+        "_id": None,
+        "count": {"$sum": 1},
+        "sum": {"$sum": value},
+        "min": {"$min": value},
+        "max": {"$max": value},
+        "mean": {"$avg": value},
+        "first_date": {"$min": "$created_date"},
+        "last_date": {"$max": "$created_date"},
+    }
+    if percentile:
+        group["percentiles"] = {
+            "$percentile": {"input": value, "p": percentile, "method": "approximate"}
+        }
+    conditions = readings_filter(device_id, start, end)
+    conditions.append({f"data.{field}": {"$type": "number"}})
+    pipeline = [{"$match": {"$and": conditions}}, {"$group": group}]
+    collection: AgnosticCollection = DeviceData.get_motor_collection()
+    try:
+        result = await collection.aggregate(
+            pipeline, maxTimeMS=settings.stats_max_time_ms
+        ).to_list(length=1)
+    except ExecutionTimeout:
+        raise HTTPException(status_code=504, detail="Statistics query timed out")
+    except OperationFailure:
+        raise HTTPException(status_code=400, detail="Statistics query not supported")
+    if not result or not result[0]["count"]:
+        return DeviceStats(field=field, count=0)
+    stats = result[0]
+    stats["percentiles"] = {
+        str(p): v for p, v in zip(percentile, stats.pop("percentiles", []))
+    }
+    return DeviceStats(field=field, **stats)
+
+
 @router.put("/devices/{device_id}", response_model=Device)
 async def update_device(
     device_id: PydanticObjectId,
     updated_device: DeviceCreate,
-    user: User = Depends(require_role(Role.ADMIN)),
+    claims: TokenClaims = Depends(require_role(Role.ADMIN)),
 ):
     existing_device = await Device.get(device_id)
     if not existing_device:
@@ -91,30 +639,72 @@ async def update_device(
     }
 
     await existing_device.update({"$set": update_data})
+    forget_api_key(existing_device.api_key)
+    notes_waiters.notify(device_id)
     return await Device.get(device_id)
 
 
 @router.get("/devices/{device_id}/key")
 async def get_device_api_key(
-    device_id: PydanticObjectId, user: User = Depends(require_role(Role.ADMIN))
+    device_id: PydanticObjectId, claims: TokenClaims = Depends(require_role(Role.ADMIN))
 ) -> str:
     device = await Device.get(device_id)
     return device.api_key
 
 
-@router.get("/devices", response_model=list[DevicePublic])
-async def list_devices():
-    devices = await Device.find_all().to_list()
-    return devices
+@router.get("/devices", response_model=list[DeviceSummary])
+async def list_devices(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    data_limit: int = Query(
+        0,
+        ge=0,
+        le=1000,
+        description="Include this many latest data points per device",
+    ),
+):
+    projection: dict = {
+        "created_date": 1,
+        "updated_date": 1,
+        "device_id": 1,
+        "notes": 1,
+        "retention": 1,
+        "reading_count": 1,
+        "last_reading_date": 1,
+    }
+    recent_data_projection(projection, data_limit)
+    pipeline = [
+        {"$sort": {"_id": 1}},
+        {"$skip": skip},
+        {"$limit": limit},
+        {"$project": projection},
+    ]
+    collection: AgnosticCollection = Device.get_motor_collection()
+    devices = [
+        Device(**result) for result in await collection.aggregate(pipeline).to_list()
+    ]
+    semaphore = asyncio.Semaphore(settings.latest_concurrency)
+    data = await asyncio.gather(
+        *(latest_readings(device, data_limit, semaphore) for device in devices)
+    )
+    return [
+        DeviceSummary(**device.model_dump(), data=readings)
+        for device, readings in zip(devices, data)
+    ]
 
 
 @router.delete("/devices/{device_id}")
 async def delete_device(
-    device_id: PydanticObjectId, user: User = Depends(require_role(Role.ADMIN))
+    device_id: PydanticObjectId, claims: TokenClaims = Depends(require_role(Role.ADMIN))
 ):
     existing_device = await Device.get(device_id)
     if not existing_device:
         raise HTTPException(status_code=404, detail="Device not found")
 
+    await DeviceData.find(DeviceData.device == device_id).delete()
+    await DeviceRollup.find(DeviceRollup.device == device_id).delete()
     await existing_device.delete()
+    forget_api_key(existing_device.api_key)
+    hot_window.pop(device_id)
+    notes_waiters.notify(device_id)
     return {"message": "Device deleted successfully"}
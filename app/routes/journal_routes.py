@@ -1,18 +1,19 @@
 from datetime import datetime, timezone
 
 from beanie import PydanticObjectId
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 
-from app.auth import require_role
+from app.auth import require_role, require_user
+from app.etag import document_tag, not_modified
 from app.models.journals import Entry, Journal, JournalCreate, JournalUpdate
-from app.models.users import Role, User
+from app.models.users import Role, TokenClaims, User
 
 router = APIRouter()
 
 
 @router.post("/journals", response_model=Journal)
 async def create_journal(
-    journal: JournalCreate, user: User = Depends(require_role(Role.EDITOR))
+    journal: JournalCreate, user: User = Depends(require_user(Role.EDITOR))
 ):
     existing_journal = await Journal.find_one(Journal.title == journal.title)
     if existing_journal:
@@ -32,10 +33,14 @@ async def list_journals():
 
 
 @router.get("/journals/{journal_id}")
-async def get_user(journal_id: str):
+async def get_user(request: Request, response: Response, journal_id: str):
+    cached = await not_modified(request, Journal, journal_id)
+    if cached:
+        return cached
     journal = await Journal.get(journal_id)
     if not journal:
         raise HTTPException(status_code=404, detail="Journal not found")
+    response.headers["ETag"] = document_tag(journal)
     return journal
 
 
@@ -43,7 +48,7 @@ async def get_user(journal_id: str):
 async def update_journal(
     journal_id: PydanticObjectId,
     journal_update: JournalUpdate,
-    user: User = Depends(require_role(Role.EDITOR)),
+    claims: TokenClaims = Depends(require_role(Role.EDITOR)),
 ):
     existing_journal = await Journal.get(journal_id)
     if not existing_journal:
@@ -65,7 +70,8 @@ async def update_journal(
 
 @router.delete("/journals/{journal_id}")
 async def delete_journal(
-    journal_id: PydanticObjectId, user: User = Depends(require_role(Role.ADMIN))
+    journal_id: PydanticObjectId,
+    claims: TokenClaims = Depends(require_role(Role.ADMIN)),
 ):
     existing_journal = await Journal.get(journal_id)
     if not existing_journal:
@@ -1,17 +1,18 @@
 from datetime import datetime, timezone
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 
-from app.auth import require_role
+from app.auth import require_role, require_user
+from app.etag import document_tag, not_modified
 from app.models.pages import Page, PageCreate
-from app.models.users import Role, User
+from app.models.users import Role, TokenClaims, User
 
 router = APIRouter()
 
 
 @router.post("/pages", response_model=Page)
 async def create_page(
-    page: PageCreate, user: User = Depends(require_role(Role.EDITOR))
+    page: PageCreate, user: User = Depends(require_user(Role.EDITOR))
 ):
     existing_page: Page = await Page.find_one(Page.title == page.title)
     if existing_page:
@@ -31,22 +32,28 @@ async def list_pages():
 
 
 @router.get("/pages/{page_id}", response_model=Page)
-async def get_page(page_id: str):
+async def get_page(request: Request, response: Response, page_id: str):
+    cached = await not_modified(request, Page, page_id)
+    if cached:
+        return cached
     page = await Page.get(page_id)
     if not page:
         raise HTTPException(status_code=404, detail="Page not found")
+    response.headers["ETag"] = document_tag(page)
     return page
 
 
 @router.put("/pages/{page_id}", response_model=Page)
 async def update_page(
-    page_id: str, page: PageCreate, user: User = Depends(require_role(Role.EDITOR))
+    page_id: str,
+    page: PageCreate,
+    claims: TokenClaims = Depends(require_role(Role.EDITOR)),
 ):
     existing_page: Page = await Page.get(page_id)
     if not existing_page:
         raise HTTPException(status_code=404, detail="Page not found")
     await existing_page.fetch_link("author")
-    if existing_page.author.id != user.id and user.role != Role.ADMIN:
+    if existing_page.author.id != claims.uid and claims.role != Role.ADMIN:
         raise HTTPException(status_code=403, detail="Permission denied")
 
     update_data = {
@@ -60,7 +67,9 @@ async def update_page(
 
 
 @router.delete("/pages/{page_id}")
-async def delete_page(page_id: str, user: User = Depends(require_role(Role.ADMIN))):
+async def delete_page(
+    page_id: str, claims: TokenClaims = Depends(require_role(Role.ADMIN))
+):
     page = await Page.get(page_id)
     if not page:
         raise HTTPException(status_code=404, detail="Page not found")
@@ -5,8 +5,15 @@ from fastapi import APIRouter, Depends, HTTPException
 from fastapi.security import OAuth2PasswordRequestForm
 from password_validator import PasswordValidator
 
-from app.auth import authenticate_user, create_access_token, pwd_context, require_role
-from app.models.users import Role, User, UserCreate, UserShow
+from app.auth import (
+    authenticate_user,
+    create_access_token,
+    forget_user,
+    get_current_user,
+    pwd_context,
+    require_role,
+)
+from app.models.users import Role, TokenClaims, User, UserCreate, UserShow
 
 router = APIRouter()
 
@@ -18,7 +25,7 @@ schema.min(10).max(
 
 @router.post("/users", response_model=UserShow)
 async def create_user(
-    new_user: UserCreate, user: User = Depends(require_role(Role.ADMIN))
+    new_user: UserCreate, claims: TokenClaims = Depends(require_role(Role.ADMIN))
 ):
     existing_user = await User.find_one(User.username == new_user.username)
     if existing_user:
@@ -51,13 +58,14 @@ async def get_user(user_id: PydanticObjectId):
 
 @router.delete("/users/{user_id}")
 async def delete_user(
-    user_id: PydanticObjectId, user: User = Depends(require_role(Role.ADMIN))
+    user_id: PydanticObjectId, claims: TokenClaims = Depends(require_role(Role.ADMIN))
 ):
     existing_user = await User.get(user_id)
     if not existing_user:
         raise HTTPException(status_code=404, detail="User not found")
 
     await existing_user.delete()
+    forget_user(user_id)
     return {"message": "User deleted successfully"}
 
 
@@ -65,7 +73,7 @@ async def delete_user(
 async def update_user(
     user_id: PydanticObjectId,
     updated_user: UserCreate,
-    user: User = Depends(require_role(Role.ADMIN)),
+    claims: TokenClaims = Depends(require_role(Role.ADMIN)),
 ):
     existing_user = await User.get(user_id)
     if not existing_user:
@@ -78,6 +86,7 @@ async def update_user(
     update_query = {"$set": update_data}
 
     await existing_user.update(update_query)
+    forget_user(user_id)
     return await User.get(user_id)
 
 
@@ -92,10 +101,12 @@ async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(
     user = await authenticate_user(form_data.username, form_data.password)
     if not user:
         raise HTTPException(status_code=400, detail="Incorrect username or password")
-    access_token = create_access_token(data={"sub": user.username})
+    access_token = create_access_token(
+        data={"sub": user.username, "uid": str(user.id), "role": user.role.value}
+    )
     return {"access_token": access_token, "token_type": "bearer"}
 
 
 @router.get("/current/user", response_model=UserShow)
-async def read_users_me(current_user: User = Depends(require_role(Role.AUTHENTICATED))):
+async def read_users_me(current_user: User = Depends(get_current_user)):
     return current_user
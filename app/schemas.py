@@ -0,0 +1,40 @@
+from functools import lru_cache
+from typing import Any, Dict, Optional, Type
+
+from pydantic import BaseModel, ConfigDict, Field, create_model
+
+from app.config import settings
+from app.metrics import metrics
+from app.models.devices import DevicePrincipal, DeviceSchema
+
+FIELD_TYPES = {"int": int, "float": float, "bool": bool, "str": str}
+
+
+@lru_cache(maxsize=settings.schema_cache_size)
+def compiled_validator(schema_json: str) -> Type[BaseModel]:
+    schema = DeviceSchema.model_validate_json(schema_json)
+    fields: Dict[str, Any] = {}
+    for index, (name, field) in enumerate(schema.fields.items()):
+        field_type = FIELD_TYPES[field.type]
+        fields[f"field_{index}"] = (
+            field_type if field.required else Optional[field_type],
+            Field(... if field.required else None, alias=name),
+        )
+    return create_model(
+        "DeviceReadingData",
+        __config__=ConfigDict(extra=schema.extra),
+        **fields,
+    )
+
+
+def validate_data(device: DevicePrincipal, data: Dict[str, Any]) -> Dict[str, Any]:
+    if device.data_schema is None:
+        return data
+    validator = compiled_validator(device.data_schema.model_dump_json())
+    try:
+        return validator.model_validate(data).model_dump(
+            by_alias=True, exclude_none=True
+        )
+    except ValueError:
+        metrics.incr("schema.rejected")
+        raise
@@ -0,0 +1,199 @@
+import time
+from collections import OrderedDict, deque
+from datetime import datetime, timezone
+from typing import Deque, Dict, Iterable, List, Optional
+
+from beanie import PydanticObjectId
+
+from app.config import settings
+from app.metrics import metrics
+from app.models.devices import DeviceData, DeviceReading
+
+
+def naive_utc(dt: datetime) -> datetime:
+    if dt.tzinfo is None:
+        return dt
+    return dt.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def stored_date(dt: datetime) -> datetime:
+    dt = naive_utc(dt)
+    return dt.replace(microsecond=dt.microsecond // 1000 * 1000)
+
+
+def window_reading(reading: DeviceData) -> DeviceReading:
+    return DeviceReading(
+        id=reading.id,
+        created_date=stored_date(reading.created_date),
+        data=reading.data,
+    )
+
+
+async def query_latest(device_id: PydanticObjectId, limit: int) -> List[DeviceReading]:
+    readings = (
+        await DeviceData.find(DeviceData.device == device_id)
+        .sort(-DeviceData.created_date)
+        .limit(limit)
+        .project(DeviceReading)
+        .to_list()
+    )
+    readings.reverse()
+    return readings
+
+
+class DeviceWindow:
+    def __init__(self, readings: List[DeviceReading], reading_count: int) -> None:
+        self.expires = time.monotonic() + settings.hot_window_ttl
+        self.reading_count = reading_count
+        self.readings: Deque[DeviceReading] = deque(readings, settings.hot_window_size)
+
+    def current(
+        self, reading_count: int, last_reading_date: Optional[datetime]
+    ) -> bool:
+        if self.expires < time.monotonic() or self.reading_count != reading_count:
+            return False
+        if self.readings and last_reading_date is not None:
+            return self.readings[-1].created_date == stored_date(last_reading_date)
+        return True
+
+    def append(self, reading: DeviceReading) -> int:
+        before = len(self.readings)
+        if any(item.id == reading.id for item in self.readings):
+            return 0
+        self.reading_count += 1
+        if self.readings and reading.created_date < self.readings[-1].created_date:
+            readings = sorted(
+                [*self.readings, reading], key=lambda item: item.created_date
+            )
+            self.readings.clear()
+            self.readings.extend(readings)
+        else:
+            self.readings.append(reading)
+        return len(self.readings) - before
+
+
+class HotWindow:
+    def __init__(self) -> None:
+        self.windows: OrderedDict[PydanticObjectId, DeviceWindow] = OrderedDict()
+        self.size = 0
+        self._warming: Dict[PydanticObjectId, List[DeviceReading]] = {}
+
+    def covers(self, data_limit: int) -> bool:
+        return 0 < data_limit <= settings.hot_window_size
+
+    def _store(
+        self,
+        device_id: PydanticObjectId,
+        readings: List[DeviceReading],
+        reading_count: int,
+    ) -> None:
+        self.pop(device_id)
+        window = DeviceWindow(readings, reading_count)
+        self.windows[device_id] = window
+        self.size += len(window.readings)
+        self._evict()
+
+    def _evict(self) -> None:
+        while self.size > settings.hot_window_max_readings and self.windows:
+            _, evicted = self.windows.popitem(last=False)
+            self.size -= len(evicted.readings)
+            metrics.incr("hot_window.evictions")
+
+    def extend(self, readings: Iterable[DeviceData]) -> None:
+        for reading in readings:
+            if reading.device in self._warming:
+                self._warming[reading.device].append(window_reading(reading))
+                continue
+            window = self.windows.get(reading.device)
+            if window is None:
+                continue
+            self.size += window.append(window_reading(reading))
+            self.windows.move_to_end(reading.device)
+        self._evict()
+
+    def sync(
+        self,
+        device_id: PydanticObjectId,
+        readings: List[DeviceData],
+        reading_count: int,
+    ) -> None:
+        window = self.windows.get(device_id)
+        if (
+            window is None
+            or device_id in self._warming
+            or window.reading_count + len(readings) == reading_count
+        ):
+            self.extend(readings)
+        else:
+            self.pop(device_id)
+            metrics.incr("hot_window.invalidations")
+
+    def pop(self, device_id: PydanticObjectId) -> None:
+        window = self.windows.pop(device_id, None)
+        if window is not None:
+            self.size -= len(window.readings)
+
+    def clear(self) -> None:
+        self.windows.clear()
+        self.size = 0
+
+    def cached(
+        self,
+        device_id: PydanticObjectId,
+        reading_count: int,
+        last_reading_date: Optional[datetime] = None,
+    ) -> Optional[Deque[DeviceReading]]:
+        window = self.windows.get(device_id)
+        if window is None:
+            return None
+        if not window.current(reading_count, last_reading_date):
+            self.pop(device_id)
+            metrics.incr("hot_window.invalidations")
+            return None
+        self.windows.move_to_end(device_id)
+        return window.readings
+
+    def peek(
+        self,
+        device_id: PydanticObjectId,
+        data_limit: int,
+        reading_count: int,
+        last_reading_date: Optional[datetime] = None,
+    ) -> Optional[List[DeviceReading]]:
+        if not self.covers(data_limit):
+            return None
+        window = self.cached(device_id, reading_count, last_reading_date)
+        if window is None:
+            return None
+        metrics.incr("hot_window.hits")
+        return list(window)[-data_limit:]
+
+    async def latest(
+        self,
+        device_id: PydanticObjectId,
+        data_limit: int,
+        reading_count: int,
+        last_reading_date: Optional[datetime] = None,
+    ) -> List[DeviceReading]:
+        readings = self.peek(device_id, data_limit, reading_count, last_reading_date)
+        if readings is not None:
+            return readings
+        metrics.incr("hot_window.misses")
+        if device_id in self._warming:
+            return await query_latest(device_id, data_limit)
+        self._warming[device_id] = []
+        try:
+            readings = await query_latest(device_id, settings.hot_window_size)
+        except BaseException:
+            del self._warming[device_id]
+            raise
+        seen = {reading.id for reading in readings}
+        for reading in self._warming.pop(device_id):
+            if reading.id not in seen:
+                readings.append(reading)
+        readings.sort(key=lambda item: naive_utc(item.created_date))
+        self._store(device_id, readings, reading_count)
+        return readings[-data_limit:]
+
+
+hot_window = HotWindow()
@@ -1,6 +1,7 @@
 import os
 import sys
 
+import mongomock.collection
 import pytest_asyncio
 from beanie import init_beanie
 from httpx import ASGITransport, AsyncClient
@@ -9,18 +10,54 @@ from mongomock_motor import AsyncMongoMockClient
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from app.auth import pwd_context  # noqa: E402
 from app.main import app  # noqa: E402
-from app.models.devices import Device  # noqa: E402
+from app.models.devices import (  # noqa: E402
+    Device,
+    DeviceData,
+    DeviceRateState,
+    DeviceReadingKey,
+    DeviceRollup,
+)
 from app.models.journals import Journal  # noqa: E402
 from app.models.pages import Page  # noqa: E402
 from app.models.users import Role, User  # noqa: E402
 
 
+def max_updater(doc, field_name, value):
+    # mongomock cannot compare with null, which MongoDB orders below every value
+    if isinstance(doc, dict):
+        current = doc.get(field_name)
+        doc[field_name] = value if current is None else max(current, value)
+
+
+mongomock.collection._updaters["$max"] = max_updater
+
+
+def add_update(self, *args, sort=None, **kwargs):
+    # pymongo passes the update sort option, which mongomock does not know
+    return add_bulk_update(self, *args, **kwargs)
+
+
+add_bulk_update = mongomock.collection.BulkOperationBuilder.add_update
+mongomock.collection.BulkOperationBuilder.add_update = add_update
+
+
 @pytest_asyncio.fixture(loop_scope="session", scope="session", autouse=True)
 async def beanie_init():
     client = AsyncMongoMockClient()
+    # mongomock cannot create time-series collections
+    DeviceData.Settings.timeseries = None
     await init_beanie(
         database=client["testdb"],
-        document_models=[User, Journal, Device, Page],
+        document_models=[
+            User,
+            Journal,
+            Device,
+            DeviceData,
+            DeviceRateState,
+            DeviceReadingKey,
+            DeviceRollup,
+            Page,
+        ],
     )
     return client
 
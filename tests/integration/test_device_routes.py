@@ -1,9 +1,20 @@
+import asyncio
+import csv
+import gzip
+import io
+import json
+from datetime import datetime, timedelta, timezone
 from typing import List
+from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
 from beanie import PydanticObjectId
+from fastapi import HTTPException
+from pymongo.errors import OperationFailure
 
-from app.models.devices import Device
+from app.ingest import store_readings
+from app.live import reading_broker
+from app.models.devices import Device, DeviceData, DeviceRateLimit
 
 
 class TestDevices:
@@ -87,6 +98,17 @@ class TestDevices:
             headers=self.header,
         )
         assert response.status_code == 200
+        assert response.json()["data"][-1]["data"] == {"key": "value"}
+
+    @pytest.mark.asyncio
+    async def test_device_get_data_limit(self, async_client):
+        device = await Device.find_one({"device_id": "posted_device"})
+        response = await async_client.get(
+            f"/api/devices/{str(device.id)}",
+            params={"data_limit": 0},
+            headers=self.header,
+        )
+        assert response.json()["data"] == []
 
     @pytest.mark.asyncio
     async def test_device_get_notes(self, async_client):
@@ -280,3 +302,1011 @@ class TestDevices:
             },
         )
         assert response.status_code == 401
+
+
+class TestDeviceDataBatch:
+    @pytest.mark.asyncio
+    async def test_device_data_batch(self, async_client):
+        gateway = Device(device_id="gateway_device")
+        sensor = Device(device_id="sensor_device")
+        await Device.insert_many([gateway, sensor])
+
+        response = await async_client.post(
+            "/api/devices/data/batch",
+            json={
+                "readings": [
+                    {"device_id": "gateway_device", "data": {"temp": 20}},
+                    {
+                        "device_id": "sensor_device",
+                        "api_key": sensor.api_key,
+                        "data": {"temp": 21},
+                    },
+                    {"device_id": "sensor_device", "data": {"temp": 22}},
+                    {"device_id": "gateway_device", "api_key": "bad", "data": {}},
+                    {"device_id": "gateway_device"},
+                ]
+            },
+            headers={"X-API-KEY": gateway.api_key},
+        )
+        body = response.json()
+        assert response.status_code == 200
+        assert body["accepted"] == 2
+        assert body["rejected"] == 3
+        assert [result["ok"] for result in body["results"]] == [
+            True,
+            True,
+            False,
+            False,
+            False,
+        ]
+        assert body["results"][2]["detail"] == "Mismatched device ID"
+        assert body["results"][3]["detail"] == "Invalid API key"
+        assert body["results"][4]["detail"] == "Invalid reading"
+
+        for device in (gateway, sensor):
+            stored = await Device.get(device.id)
+            assert stored.reading_count == 1
+            assert await DeviceData.find(DeviceData.device == device.id).count() == 1
+            await device.delete()
+
+    @pytest.mark.asyncio
+    async def test_device_data_batch_too_large(self, async_client):
+        device = Device(device_id="large_batch_device")
+        await device.insert()
+        with patch("app.routes.device_routes.settings.device_data_batch_max", 1):
+            response = await async_client.post(
+                "/api/devices/data/batch",
+                json={
+                    "readings": [
+                        {"device_id": "large_batch_device", "data": {}},
+                        {"device_id": "large_batch_device", "data": {}},
+                    ]
+                },
+                headers={"X-API-KEY": device.api_key},
+            )
+        assert response.status_code == 413
+        await device.delete()
+
+
+class TestDeviceSeries:
+    @pytest.mark.asyncio
+    async def test_device_series(self, async_client):
+        device = Device(device_id="series_device")
+        await device.insert()
+        for value in (10, 20, 30):
+            response = await async_client.post(
+                "/api/devices/data",
+                json={"device_id": "series_device", "data": {"temp": value}},
+                headers={"X-API-KEY": device.api_key},
+            )
+            assert response.status_code == 200
+
+        response = await async_client.get(
+            f"/api/devices/{device.id}/series",
+            params={"field": "temp", "resolution": "1d"},
+        )
+        assert response.status_code == 200
+        points = response.json()
+        assert len(points) == 1
+        assert points[0]["count"] == 3
+        assert points[0]["mean"] == 20
+        assert (points[0]["min"], points[0]["max"]) == (10, 30)
+
+        response = await async_client.get(
+            f"/api/devices/{device.id}/series",
+            params={"field": "temp", "resolution": "1w"},
+        )
+        assert response.status_code == 422
+        await device.delete()
+
+
+class TestDeviceReadings:
+    @pytest.mark.asyncio
+    async def test_device_readings_pagination(self, async_client):
+        device = Device(device_id="paged_device")
+        await device.insert()
+        start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        await DeviceData.insert_many(
+            [
+                DeviceData(
+                    device=device.id,
+                    created_date=start + timedelta(minutes=minute),
+                    data={"minute": minute},
+                )
+                for minute in range(5)
+            ]
+        )
+
+        response = await async_client.get(
+            f"/api/devices/{device.id}/readings",
+            params={
+                "from": (start + timedelta(minutes=1)).isoformat(),
+                "limit": 2,
+            },
+        )
+        page = response.json()
+        assert [r["data"]["minute"] for r in page["data"]] == [1, 2]
+        assert page["has_more"] is True
+
+        response = await async_client.get(
+            f"/api/devices/{device.id}/readings",
+            params={"since": page["next_cursor"], "limit": 5},
+        )
+        page = response.json()
+        assert [r["data"]["minute"] for r in page["data"]] == [3, 4]
+        assert page["has_more"] is False
+
+        response = await async_client.get(
+            f"/api/devices/{device.id}/readings",
+            params={"since": page["next_cursor"]},
+        )
+        tail = response.json()
+        assert tail["data"] == []
+        assert tail["next_cursor"] == page["next_cursor"]
+        await device.delete()
+
+    @pytest.mark.asyncio
+    async def test_device_readings_same_timestamp(self, async_client):
+        device = Device(device_id="tied_device")
+        await device.insert()
+        created_date = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        await DeviceData.insert_many(
+            [
+                DeviceData(device=device.id, created_date=created_date, data={"n": n})
+                for n in range(3)
+            ]
+        )
+
+        seen = []
+        since = None
+        for _ in range(3):
+            params = {"limit": 1}
+            if since:
+                params["since"] = since
+            response = await async_client.get(
+                f"/api/devices/{device.id}/readings", params=params
+            )
+            page = response.json()
+            seen.extend(r["data"]["n"] for r in page["data"])
+            since = page["next_cursor"]
+        assert seen == [0, 1, 2]
+        await device.delete()
+
+    @pytest.mark.asyncio
+    async def test_device_readings_invalid_cursor(self, async_client):
+        response = await async_client.get(
+            f"/api/devices/{PydanticObjectId()}/readings",
+            params={"since": "not-a-cursor"},
+        )
+        assert response.status_code == 400
+
+
+class TestDeviceExport:
+    @pytest.mark.asyncio
+    async def test_device_export(self, async_client):
+        device = Device(device_id="export_device")
+        await device.insert()
+        start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        await DeviceData.insert_many(
+            [
+                DeviceData(
+                    device=device.id,
+                    created_date=start + timedelta(minutes=minute),
+                    data={"temp": 20 + minute, "hum": 50, "tags": ["a"]},
+                )
+                for minute in range(3)
+            ]
+        )
+
+        response = await async_client.get(f"/api/devices/{device.id}/export")
+        assert response.headers["content-type"] == "application/x-ndjson"
+        rows = [json.loads(line) for line in response.text.splitlines()]
+        assert [row["data"]["temp"] for row in rows] == [20, 21, 22]
+
+        response = await async_client.get(
+            f"/api/devices/{device.id}/export",
+            params={
+                "format": "csv",
+                "fields": "temp,tags",
+                "from": (start + timedelta(minutes=1)).isoformat(),
+            },
+        )
+        assert response.headers["content-type"].startswith("text/csv")
+        rows = list(csv.reader(io.StringIO(response.text)))
+        assert rows[0] == ["_id", "created_date", "temp", "tags"]
+        assert [row[2:] for row in rows[1:]] == [["21", '["a"]'], ["22", '["a"]']]
+
+        response = await async_client.get(
+            f"/api/devices/{device.id}/export", params={"fields": "$where"}
+        )
+        assert response.status_code == 400
+        response = await async_client.get(
+            f"/api/devices/{device.id}/export", params={"fields": "temp,a..b"}
+        )
+        assert response.status_code == 400
+        await device.delete()
+
+
+class TestDeviceColumnarExport:
+    @pytest.mark.asyncio
+    async def test_device_export_arrow(self, async_client):
+        pa = pytest.importorskip("pyarrow")
+        device = Device(device_id="arrow_device")
+        await device.insert()
+        await DeviceData.insert_many(
+            [DeviceData(device=device.id, data={"temp": value}) for value in (1, 2)]
+        )
+        response = await async_client.get(f"/api/devices/{device.id}/export/columnar")
+        assert response.status_code == 200
+        table = pa.ipc.open_stream(response.content).read_all()
+        assert table.column("temp").to_pylist() == [1.0, 2.0]
+        await device.delete()
+
+    @pytest.mark.asyncio
+    async def test_device_export_columnar_without_pyarrow(self, async_client):
+        with patch("app.routes.device_routes.pa", None):
+            response = await async_client.get(
+                f"/api/devices/{PydanticObjectId()}/export/columnar"
+            )
+        assert response.status_code == 501
+
+
+class TestDeviceSummaries:
+    @pytest.mark.asyncio
+    async def test_device_list_summaries(self, async_client):
+        device = Device(device_id="summary_device")
+        await device.insert()
+        for value in range(3):
+            await async_client.post(
+                "/api/devices/data",
+                json={"device_id": "summary_device", "data": {"value": value}},
+                headers={"X-API-KEY": device.api_key},
+            )
+
+        response = await async_client.get("/api/devices", params={"limit": 1000})
+        summary = next(
+            item for item in response.json() if item["device_id"] == "summary_device"
+        )
+        assert summary["reading_count"] == 3
+        assert summary["last_reading_date"] is not None
+        assert summary["data"] == []
+        assert "api_key" not in summary
+
+        response = await async_client.get(
+            "/api/devices", params={"limit": 1000, "data_limit": 2}
+        )
+        summary = next(
+            item for item in response.json() if item["device_id"] == "summary_device"
+        )
+        assert [r["data"]["value"] for r in summary["data"]] == [1, 2]
+
+        response = await async_client.get("/api/devices", params={"data_limit": 1001})
+        assert response.status_code == 422
+        await device.delete()
+
+    @pytest.mark.asyncio
+    async def test_device_list_bounds_fallback_queries(self, async_client):
+        devices = [Device(device_id=f"bounded_list_{n}") for n in range(4)]
+        await Device.insert_many(devices)
+        running = peak = 0
+
+        async def slow_query(device_id, data_limit):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            return []
+
+        with (
+            patch("app.routes.device_routes.settings.latest_concurrency", 2),
+            patch("app.routes.device_routes.settings.hot_window_size", 0),
+            patch("app.routes.device_routes.query_latest", slow_query),
+        ):
+            response = await async_client.get(
+                "/api/devices", params={"limit": 1000, "data_limit": 5}
+            )
+        assert response.status_code == 200
+        assert 1 <= peak <= 2
+        for device in devices:
+            await device.delete()
+
+    @pytest.mark.asyncio
+    async def test_device_list_pagination(self, async_client):
+        devices = [Device(device_id=f"paged_list_{n}") for n in range(3)]
+        await Device.insert_many(devices)
+        response = await async_client.get("/api/devices", params={"limit": 1000})
+        ids = [item["id"] for item in response.json()]
+
+        response = await async_client.get(
+            "/api/devices", params={"skip": 1, "limit": 2}
+        )
+        assert [item["id"] for item in response.json()] == ids[1:3]
+        for device in devices:
+            await device.delete()
+
+
+class TestDeviceRetention:
+    @pytest.mark.asyncio
+    async def test_device_retention_settings(self, async_client, create_test_users):
+        response = await async_client.post(
+            "/api/token",
+            data={"username": "admin_user", "password": "Password!23"},
+        )
+        header = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+        response = await async_client.post(
+            "/api/devices",
+            json={"device_id": "retained_device", "retention": {"raw_days": 30}},
+            headers=header,
+        )
+        assert response.status_code == 200
+        device_id = response.json()["_id"]
+        assert response.json()["retention"] == {"raw_days": 30, "rollup_days": None}
+
+        response = await async_client.post(
+            "/api/devices",
+            json={"device_id": "bad_retention", "retention": {"raw_days": 0}},
+            headers=header,
+        )
+        assert response.status_code == 422
+
+        response = await async_client.post("/api/admin/retention/prune", headers=header)
+        assert response.status_code == 200
+        assert set(response.json()) == {"devices", "readings", "rollups"}
+
+        response = await async_client.get("/api/admin/metrics", headers=header)
+        assert response.status_code == 200
+        assert response.json()["counters"]["retention.runs"] >= 1
+
+        response = await async_client.get("/api/admin/metrics")
+        assert response.status_code == 401
+
+        await async_client.delete(f"/api/devices/{device_id}", headers=header)
+
+
+class TestDeviceStream:
+    @pytest.mark.asyncio
+    async def test_posted_readings_reach_subscribers(self, async_client):
+        device = Device(device_id="streamed_device")
+        await device.insert()
+        with reading_broker.subscription([device.id]) as queue:
+            response = await async_client.post(
+                "/api/devices/data",
+                json={"device_id": "streamed_device", "data": {"value": 1}},
+                headers={"X-API-KEY": device.api_key},
+            )
+            assert response.status_code == 200
+            reading = queue.get_nowait()
+        assert reading.device == device.id
+        assert reading.data == {"value": 1}
+        await device.delete()
+
+    @pytest.mark.asyncio
+    async def test_stream_rejects_too_many_devices(self, async_client):
+        with patch("app.routes.device_routes.settings.live_max_devices", 1):
+            response = await async_client.get(
+                "/api/devices/stream",
+                params={
+                    "device_id": [str(PydanticObjectId()), str(PydanticObjectId())]
+                },
+            )
+        assert response.status_code == 400
+
+
+class TestDeviceBinaryIngest:
+    @pytest.mark.asyncio
+    async def test_msgpack_reading(self, async_client):
+        msgpack = pytest.importorskip("msgpack")
+        device = Device(device_id="msgpack_device", notes={"mode": "binary"})
+        await device.insert()
+        response = await async_client.post(
+            "/api/devices/data",
+            content=msgpack.packb(
+                {"device_id": "msgpack_device", "data": {"temp": 21.5}}
+            ),
+            headers={
+                "X-API-KEY": device.api_key,
+                "Content-Type": "application/msgpack",
+                "Accept": "application/msgpack",
+            },
+        )
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/msgpack"
+        assert msgpack.unpackb(response.content) == {"notes": {"mode": "binary"}}
+        stored = await DeviceData.find_one(DeviceData.device == device.id)
+        assert stored.data == {"temp": 21.5}
+        await DeviceData.find(DeviceData.device == device.id).delete()
+        await device.delete()
+
+    @pytest.mark.asyncio
+    async def test_cbor_batch_with_json_response(self, async_client):
+        cbor2 = pytest.importorskip("cbor2")
+        device = Device(device_id="cbor_device")
+        await device.insert()
+        response = await async_client.post(
+            "/api/devices/data/batch",
+            content=cbor2.dumps(
+                {
+                    "readings": [
+                        {"device_id": "cbor_device", "data": {"n": n}} for n in range(3)
+                    ]
+                }
+            ),
+            headers={"X-API-KEY": device.api_key, "Content-Type": "application/cbor"},
+        )
+        assert response.status_code == 200
+        assert response.json()["accepted"] == 3
+        await DeviceData.find(DeviceData.device == device.id).delete()
+        await device.delete()
+
+    @pytest.mark.asyncio
+    async def test_invalid_binary_body(self, async_client):
+        pytest.importorskip("msgpack")
+        device = Device(device_id="broken_msgpack_device")
+        await device.insert()
+        response = await async_client.post(
+            "/api/devices/data",
+            content=b"\xc1",
+            headers={
+                "X-API-KEY": device.api_key,
+                "Content-Type": "application/msgpack",
+            },
+        )
+        assert response.status_code == 422
+        await device.delete()
+
+
+class TestDeviceCompression:
+    @pytest.mark.asyncio
+    async def test_gzip_request_body(self, async_client):
+        device = Device(device_id="gzip_device")
+        await device.insert()
+        response = await async_client.post(
+            "/api/devices/data",
+            content=gzip.compress(
+                json.dumps({"device_id": "gzip_device", "data": {"v": 1}}).encode()
+            ),
+            headers={
+                "X-API-KEY": device.api_key,
+                "Content-Type": "application/json",
+                "Content-Encoding": "gzip",
+            },
+        )
+        assert response.status_code == 200
+        stored = await DeviceData.find_one(DeviceData.device == device.id)
+        assert stored.data == {"v": 1}
+        await DeviceData.find(DeviceData.device == device.id).delete()
+        await device.delete()
+
+    @pytest.mark.asyncio
+    async def test_oversized_request_body(self, async_client):
+        with patch("app.compression.settings.request_body_max", 10):
+            response = await async_client.post(
+                "/api/devices/data",
+                content=gzip.compress(b"{" + b" " * 100 + b"}"),
+                headers={"Content-Encoding": "gzip"},
+            )
+        assert response.status_code == 413
+
+    @pytest.mark.asyncio
+    async def test_large_response_is_compressed(self, async_client):
+        device = Device(device_id="compressed_device", notes={"text": "x" * 5000})
+        await device.insert()
+        response = await async_client.get(
+            f"/api/devices/{device.id}", headers={"Accept-Encoding": "gzip"}
+        )
+        assert response.headers["content-encoding"] == "gzip"
+        assert response.headers["etag"].startswith('W/"')
+        assert response.json()["notes"] == {"text": "x" * 5000}
+
+        response = await async_client.get(
+            f"/api/devices/{device.id}",
+            headers={
+                "Accept-Encoding": "gzip",
+                "If-None-Match": response.headers["etag"],
+            },
+        )
+        assert response.status_code == 304
+
+        response = await async_client.get(
+            f"/api/devices/{device.id}/notes", headers={"Accept-Encoding": "identity"}
+        )
+        assert "content-encoding" not in response.headers
+        await device.delete()
+
+
+class TestDeviceConditionalGet:
+    @pytest.mark.asyncio
+    async def test_device_notes_etag(self, async_client, create_test_users):
+        device = Device(device_id="etag_device", notes={"interval": 60})
+        await device.insert()
+        url = f"/api/devices/{device.id}/notes"
+
+        response = await async_client.get(url)
+        etag = response.headers["etag"]
+        assert response.json() == {"notes": {"interval": 60}}
+
+        response = await async_client.get(url, headers={"If-None-Match": etag})
+        assert response.status_code == 304
+
+        await async_client.post(
+            "/api/devices/data",
+            json={"device_id": "etag_device", "data": {"v": 1}},
+            headers={"X-API-KEY": device.api_key},
+        )
+        response = await async_client.get(url, headers={"If-None-Match": etag})
+        assert response.status_code == 304
+
+        response = await async_client.post(
+            "/api/token",
+            data={"username": "admin_user", "password": "Password!23"},
+        )
+        header = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        await async_client.put(
+            f"/api/devices/{device.id}",
+            json={"device_id": "etag_device", "notes": {"interval": 30}},
+            headers=header,
+        )
+        response = await async_client.get(url, headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.headers["etag"] != etag
+        assert response.json() == {"notes": {"interval": 30}}
+        await DeviceData.find(DeviceData.device == device.id).delete()
+        await device.delete()
+
+    @pytest.mark.asyncio
+    async def test_device_etag_tracks_readings(self, async_client):
+        device = Device(device_id="etag_readings_device")
+        await device.insert()
+        url = f"/api/devices/{device.id}"
+
+        etag = (await async_client.get(url)).headers["etag"]
+        response = await async_client.get(url, headers={"If-None-Match": etag})
+        assert response.status_code == 304
+        response = await async_client.get(
+            url, params={"data_limit": 5}, headers={"If-None-Match": etag}
+        )
+        assert response.status_code == 200
+
+        await async_client.post(
+            "/api/devices/data",
+            json={"device_id": "etag_readings_device", "data": {"v": 1}},
+            headers={"X-API-KEY": device.api_key},
+        )
+        response = await async_client.get(url, headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert len(response.json()["data"]) == 1
+        await DeviceData.find(DeviceData.device == device.id).delete()
+        await device.delete()
+
+    @pytest.mark.asyncio
+    async def test_missing_device_with_etag(self, async_client):
+        response = await async_client.get(
+            f"/api/devices/{PydanticObjectId()}/notes", headers={"If-None-Match": "*"}
+        )
+        assert response.status_code == 404
+
+
+class TestDeviceNotesLongPoll:
+    @pytest.mark.asyncio
+    async def test_poll_returns_when_notes_change(
+        self, async_client, create_test_users
+    ):
+        device = Device(device_id="polled_device", notes={"interval": 60})
+        await device.insert()
+        url = f"/api/devices/{device.id}/notes/poll"
+
+        response = await async_client.get(url)
+        assert response.status_code == 200
+        etag = response.headers["etag"]
+
+        response = await async_client.post(
+            "/api/token",
+            data={"username": "admin_user", "password": "Password!23"},
+        )
+        header = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+        async def update_later():
+            await asyncio.sleep(0.05)
+            return await async_client.put(
+                f"/api/devices/{device.id}",
+                json={"device_id": "polled_device", "notes": {"interval": 5}},
+                headers=header,
+            )
+
+        response, _ = await asyncio.gather(
+            async_client.get(
+                url, params={"timeout": 5}, headers={"If-None-Match": etag}
+            ),
+            update_later(),
+        )
+        assert response.status_code == 200
+        assert response.json() == {"notes": {"interval": 5}}
+        assert response.headers["etag"] != etag
+        await device.delete()
+
+    @pytest.mark.asyncio
+    async def test_poll_times_out_unchanged(self, async_client):
+        device = Device(device_id="idle_polled_device")
+        await device.insert()
+        url = f"/api/devices/{device.id}/notes/poll"
+        etag = (await async_client.get(url)).headers["etag"]
+
+        response = await async_client.get(
+            url, params={"timeout": 0.05}, headers={"If-None-Match": etag}
+        )
+        assert response.status_code == 304
+        assert response.headers["etag"] == etag
+        await device.delete()
+
+
+class TestDeviceDataSchema:
+    @pytest.mark.asyncio
+    async def test_schema_validates_and_coerces_readings(
+        self, async_client, create_test_users
+    ):
+        response = await async_client.post(
+            "/api/token",
+            data={"username": "admin_user", "password": "Password!23"},
+        )
+        header = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        response = await async_client.post(
+            "/api/devices",
+            json={
+                "device_id": "typed_device",
+                "data_schema": {
+                    "fields": {"temp": {"type": "float", "unit": "C", "required": True}}
+                },
+            },
+            headers=header,
+        )
+        assert response.status_code == 200
+        device = await Device.get(response.json()["_id"])
+        api_header = {"X-API-KEY": device.api_key}
+
+        response = await async_client.post(
+            "/api/devices/data",
+            json={"device_id": "typed_device", "data": {"temp": 21}},
+            headers=api_header,
+        )
+        assert response.status_code == 200
+        stored = await DeviceData.find_one(DeviceData.device == device.id)
+        assert stored.data == {"temp": 21.0}
+        assert isinstance(stored.data["temp"], float)
+
+        response = await async_client.post(
+            "/api/devices/data",
+            json={"device_id": "typed_device", "data": {"temp": "warm"}},
+            headers=api_header,
+        )
+        assert response.status_code == 422
+
+        response = await async_client.post(
+            "/api/devices/data/batch",
+            json={
+                "readings": [
+                    {"device_id": "typed_device", "data": {"temp": "19.5"}},
+                    {"device_id": "typed_device", "data": {"pressure": 1}},
+                ]
+            },
+            headers=api_header,
+        )
+        assert response.json()["accepted"] == 1
+        assert response.json()["results"][1]["detail"] == (
+            "Reading does not match device schema"
+        )
+        await DeviceData.find(DeviceData.device == device.id).delete()
+        await device.delete()
+
+
+class TestDeviceStats:
+    @pytest.mark.asyncio
+    async def test_device_stats(self, async_client):
+        device = Device(device_id="stats_device")
+        await device.insert()
+        start = datetime(2024, 5, 1, tzinfo=timezone.utc)
+        await DeviceData.insert_many(
+            [
+                DeviceData(
+                    device=device.id,
+                    created_date=start + timedelta(minutes=n),
+                    data={"temp": value, "label": "x"},
+                )
+                for n, value in enumerate([10, 20, 30, 40])
+            ]
+            + [
+                DeviceData(
+                    device=device.id,
+                    created_date=start + timedelta(minutes=5),
+                    data={"temp": "n/a"},
+                )
+            ]
+        )
+        url = f"/api/devices/{device.id}/stats"
+
+        response = await async_client.get(url, params={"field": "temp"})
+        assert response.status_code == 200
+        stats = response.json()
+        assert stats["count"] == 4
+        assert (stats["min"], stats["max"], stats["sum"], stats["mean"]) == (
+            10,
+            40,
+            100,
+            25,
+        )
+        assert stats["percentiles"] == {}
+
+        response = await async_client.get(
+            url,
+            params={
+                "field": "temp",
+                "from": (start + timedelta(minutes=2)).isoformat(),
+            },
+        )
+        assert response.json()["count"] == 2
+        assert response.json()["min"] == 30
+
+        response = await async_client.get(url, params={"field": "missing"})
+        assert response.json() == {
+            "field": "missing",
+            "count": 0,
+            "sum": None,
+            "min": None,
+            "max": None,
+            "mean": None,
+            "first_date": None,
+            "last_date": None,
+            "percentiles": {},
+        }
+
+        response = await async_client.get(
+            url, params={"field": "temp", "percentile": [1.5]}
+        )
+        assert response.status_code == 400
+        for field in ("$where", "", "a.", "a.$b", "a..b"):
+            response = await async_client.get(url, params={"field": field})
+            assert response.status_code == 400
+
+        collection = MagicMock()
+        collection.aggregate.return_value.to_list = AsyncMock(
+            side_effect=OperationFailure("Unrecognized accumulator '$percentile'")
+        )
+        with patch.object(DeviceData, "get_motor_collection", return_value=collection):
+            response = await async_client.get(
+                url, params={"field": "temp", "percentile": [0.5]}
+            )
+        assert response.status_code == 400
+
+        await DeviceData.find(DeviceData.device == device.id).delete()
+        await device.delete()
+
+
+class TestDeviceLatestBatch:
+    @pytest.mark.asyncio
+    async def test_latest_readings_for_many_devices(self, async_client):
+        devices = [Device(device_id=f"dashboard_{n}") for n in range(3)]
+        await Device.insert_many(devices)
+        for device in devices:
+            for value in range(3):
+                await async_client.post(
+                    "/api/devices/data",
+                    json={"device_id": device.device_id, "data": {"v": value}},
+                    headers={"X-API-KEY": device.api_key},
+                )
+        quiet = Device(device_id="dashboard_quiet")
+        await quiet.insert()
+        await DeviceData(device=quiet.id, data={"v": 9}).insert()
+
+        response = await async_client.get(
+            "/api/devices/latest",
+            params={
+                "device_id": [str(devices[0].id), str(devices[2].id), str(quiet.id)],
+                "data_limit": 2,
+            },
+        )
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        rows = {
+            row["device_id"]: [r["data"]["v"] for r in row["data"]]
+            for row in map(json.loads, response.text.splitlines())
+        }
+        assert rows == {
+            "dashboard_0": [1, 2],
+            "dashboard_2": [1, 2],
+            "dashboard_quiet": [9],
+        }
+
+        response = await async_client.get(
+            "/api/devices/latest", params={"prefix": "dashboard_", "data_limit": 0}
+        )
+        rows = [json.loads(line) for line in response.text.splitlines()]
+        assert len(rows) == 4
+        assert all(row["data"] == [] for row in rows)
+
+        for device in [*devices, quiet]:
+            await DeviceData.find(DeviceData.device == device.id).delete()
+            await device.delete()
+
+    @pytest.mark.asyncio
+    async def test_latest_readings_requires_devices(self, async_client):
+        response = await async_client.get("/api/devices/latest")
+        assert response.status_code == 400
+
+
+class TestDeviceIdempotentIngest:
+    @pytest.mark.asyncio
+    async def test_replay_header_survives_binary_response(self, async_client):
+        msgpack = pytest.importorskip("msgpack")
+        device = Device(device_id="binary_replay_device")
+        await device.insert()
+        payload = {"device_id": "binary_replay_device", "data": {}, "reading_id": "r1"}
+        headers = {"X-API-KEY": device.api_key, "Accept": "application/msgpack"}
+        response = await async_client.post(
+            "/api/devices/data", json=payload, headers=headers
+        )
+        assert "idempotent-replayed" not in response.headers
+        response = await async_client.post(
+            "/api/devices/data", json=payload, headers=headers
+        )
+        assert response.headers["content-type"] == "application/msgpack"
+        assert response.headers["idempotent-replayed"] == "true"
+        assert msgpack.unpackb(response.content) == {"notes": {}}
+        await DeviceData.find(DeviceData.device == device.id).delete()
+        await device.delete()
+
+    @pytest.mark.asyncio
+    async def test_retried_reading_is_stored_once(self, async_client):
+        device = Device(device_id="retrying_device")
+        await device.insert()
+        for _ in range(3):
+            response = await async_client.post(
+                "/api/devices/data",
+                json={
+                    "device_id": "retrying_device",
+                    "data": {"v": 1},
+                    "reading_id": "r1",
+                },
+                headers={"X-API-KEY": device.api_key},
+            )
+            assert response.status_code == 200
+        assert response.headers["idempotent-replayed"] == "true"
+
+        for _ in range(2):
+            response = await async_client.post(
+                "/api/devices/data",
+                json={"device_id": "retrying_device", "data": {"v": 2}},
+                headers={"X-API-KEY": device.api_key, "Idempotency-Key": "r2"},
+            )
+        assert await DeviceData.find(DeviceData.device == device.id).count() == 2
+
+        response = await async_client.post(
+            "/api/devices/data/batch",
+            json={
+                "readings": [
+                    {
+                        "device_id": "retrying_device",
+                        "data": {"v": 1},
+                        "reading_id": "r1",
+                    },
+                    {
+                        "device_id": "retrying_device",
+                        "data": {"v": 3},
+                        "reading_id": "r3",
+                    },
+                    {"device_id": "retrying_device", "data": {"v": 4}},
+                ]
+            },
+            headers={"X-API-KEY": device.api_key},
+        )
+        body = response.json()
+        assert (body["accepted"], body["duplicates"], body["rejected"]) == (2, 1, 0)
+        assert body["results"][0]["detail"] == "Duplicate reading"
+        assert await DeviceData.find(DeviceData.device == device.id).count() == 4
+        await DeviceData.find(DeviceData.device == device.id).delete()
+        await device.delete()
+
+    @pytest.mark.asyncio
+    async def test_rejected_reading_releases_its_id(self, async_client):
+        device = Device(device_id="full_buffer_device")
+        await device.insert()
+        payload = {"device_id": "full_buffer_device", "data": {}, "reading_id": "r1"}
+        with patch(
+            "app.ingest.submit_readings",
+            side_effect=HTTPException(status_code=503, detail="Ingest buffer full"),
+        ):
+            response = await async_client.post(
+                "/api/devices/data", json=payload, headers={"X-API-KEY": device.api_key}
+            )
+        assert response.status_code == 503
+        response = await async_client.post(
+            "/api/devices/data", json=payload, headers={"X-API-KEY": device.api_key}
+        )
+        assert "idempotent-replayed" not in response.headers
+        assert await DeviceData.find(DeviceData.device == device.id).count() == 1
+        await DeviceData.find(DeviceData.device == device.id).delete()
+        await device.delete()
+
+
+class TestDeviceRateLimit:
+    @pytest.mark.asyncio
+    async def test_chatty_device_is_throttled(self, async_client):
+        device = Device(
+            device_id="chatty_device", rate_limit=DeviceRateLimit(rate=0.01, burst=2)
+        )
+        await device.insert()
+        statuses = []
+        for _ in range(3):
+            response = await async_client.post(
+                "/api/devices/data",
+                json={"device_id": "chatty_device", "data": {}},
+                headers={"X-API-KEY": device.api_key},
+            )
+            statuses.append(response.status_code)
+        assert statuses == [200, 200, 429]
+        assert int(response.headers["retry-after"]) >= 99
+
+        response = await async_client.post(
+            "/api/devices/data/batch",
+            json={"readings": [{"device_id": "chatty_device", "data": {}}]},
+            headers={"X-API-KEY": device.api_key},
+        )
+        assert response.status_code == 200
+        assert response.json()["rejected"] == 1
+        assert response.json()["results"][0]["detail"] == "Rate limited"
+        assert await DeviceData.find(DeviceData.device == device.id).count() == 2
+        await DeviceData.find(DeviceData.device == device.id).delete()
+        await device.delete()
+
+    @pytest.mark.asyncio
+    async def test_batch_readings_are_charged_to_their_owner(self, async_client):
+        gateway = Device(device_id="batch_gateway")
+        chatty = Device(
+            device_id="batch_chatty", rate_limit=DeviceRateLimit(rate=0.01, burst=2)
+        )
+        await gateway.insert()
+        await chatty.insert()
+        reading = {"device_id": "batch_chatty", "api_key": chatty.api_key, "data": {}}
+        response = await async_client.post(
+            "/api/devices/data/batch",
+            json={
+                "readings": [
+                    reading,
+                    {"device_id": "batch_gateway", "data": {}},
+                    reading,
+                    reading,
+                ]
+            },
+            headers={"X-API-KEY": gateway.api_key},
+        )
+        assert response.status_code == 200
+        body = response.json()
+        assert (body["accepted"], body["rejected"]) == (3, 1)
+        assert [r["ok"] for r in body["results"]] == [True, True, True, False]
+        assert body["results"][3]["detail"] == "Rate limited"
+        for device in (gateway, chatty):
+            await DeviceData.find(DeviceData.device == device.id).delete()
+            await device.delete()
+
+
+class TestDeviceHotWindow:
+    @pytest.mark.asyncio
+    async def test_readings_from_other_workers_are_served(self, async_client):
+        device = Device(device_id="shared_window_device")
+        await device.insert()
+        url = f"/api/devices/{device.id}"
+        await store_readings([DeviceData(device=device.id, data={"v": 1})])
+        response = await async_client.get(url, params={"data_limit": 5})
+        etag = response.headers["etag"]
+        assert [r["data"] for r in response.json()["data"]] == [{"v": 1}]
+
+        with patch("app.ingest.publish_readings"):
+            await store_readings([DeviceData(device=device.id, data={"v": 2})])
+
+        response = await async_client.get(
+            url, params={"data_limit": 5}, headers={"If-None-Match": etag}
+        )
+        assert response.status_code == 200
+        assert [r["data"] for r in response.json()["data"]] == [{"v": 1}, {"v": 2}]
+        await DeviceData.find(DeviceData.device == device.id).delete()
+        await device.delete()
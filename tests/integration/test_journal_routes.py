@@ -39,6 +39,16 @@ class TestJournalRoutes:
         response = await async_client.get(f"/api/journals/{journal.id}")
         assert response.json()["description"] == "This is a test journal"
 
+    @pytest.mark.asyncio
+    async def test_get_journal_not_modified(self, async_client):
+        journal = await Journal.find_one(Journal.title == "Test Journal")
+        response = await async_client.get(f"/api/journals/{journal.id}")
+        etag = response.headers["etag"]
+        response = await async_client.get(
+            f"/api/journals/{journal.id}", headers={"If-None-Match": f'W/{etag}, "x"'}
+        )
+        assert response.status_code == 304
+
     @pytest.mark.asyncio
     async def test_get_nonexistant_journal(self, async_client):
         pid = PydanticObjectId()
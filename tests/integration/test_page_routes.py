@@ -1,5 +1,8 @@
+from unittest.mock import patch
+
 import pytest
 from beanie import PydanticObjectId
+from beanie.exceptions import RevisionIdWasChanged
 
 from app.models.pages import Page
 
@@ -95,6 +98,20 @@ class TestPages:
         response = await async_client.get(f"/api/pages/{page_id}")
         assert response.json()["_id"] == page_id
 
+    @pytest.mark.asyncio
+    async def test_page_get_not_modified(self, async_client):
+        response = await async_client.get("/api/pages")
+        page_id = response.json()[0]["_id"]
+
+        response = await async_client.get(f"/api/pages/{page_id}")
+        etag = response.headers["etag"]
+        response = await async_client.get(
+            f"/api/pages/{page_id}", headers={"If-None-Match": etag}
+        )
+        assert response.status_code == 304
+        assert response.content == b""
+        assert response.headers["etag"] == etag
+
     @pytest.mark.asyncio
     async def test_page_not_found(self, async_client):
         pid = PydanticObjectId()
@@ -125,6 +142,24 @@ class TestPages:
             )
             assert response.json()["title"] == f"Updated {user} Test Page"
 
+    @pytest.mark.asyncio
+    async def test_page_update_conflict(self, async_client):
+        response = await async_client.post(
+            "/api/token",
+            data={"username": "admin_user", "password": "Password!23"},
+        )
+        self.header = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        page = await Page.find_one(Page.title == "Updated admin_user Test Page")
+
+        with patch.object(Page, "update", side_effect=RevisionIdWasChanged):
+            response = await async_client.put(
+                f"/api/pages/{page.id}",
+                json={"title": "Conflicting Test Page", "body": "Lost update"},
+                headers=self.header,
+            )
+        assert response.status_code == 409
+        assert response.json()["detail"] == "Document was modified concurrently"
+
     @pytest.mark.asyncio
     async def test_page_update_unauthorized(self, async_client):
         user_data = {
@@ -1,7 +1,8 @@
 import pytest
 from beanie import PydanticObjectId
 
-from app.models.users import User
+from app.auth import pwd_context
+from app.models.users import Role, User
 
 
 class TestUserRoutes:
@@ -299,6 +300,47 @@ class TestUserRoutes:
         )
         assert response.json()["detail"] == "Incorrect username or password"
 
+    @pytest.mark.asyncio
+    async def test_demoted_and_deleted_admin_loses_access(
+        self, create_test_users, async_client
+    ):
+        async def bearer(username: str) -> dict[str, str]:
+            response = await async_client.post(
+                "/api/token", data={"username": username, "password": "Password!23"}
+            )
+            return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+        user = User(
+            username="revoked_admin",
+            email="revoked_admin@example.com",
+            password=pwd_context.hash("Password!23"),
+            role=Role.ADMIN,
+        )
+        await user.insert()
+        admin = await bearer("admin_user")
+        revoked = await bearer("revoked_admin")
+        response = await async_client.get("/api/admin/metrics", headers=revoked)
+        assert response.status_code == 200
+
+        response = await async_client.put(
+            f"/api/users/{user.id}",
+            headers=admin,
+            json={
+                "username": user.username,
+                "email": user.email,
+                "password": "Password!23",
+                "role": Role.AUTHENTICATED.value,
+            },
+        )
+        assert response.status_code == 200
+        response = await async_client.get("/api/admin/metrics", headers=revoked)
+        assert response.status_code == 403
+
+        response = await async_client.delete(f"/api/users/{user.id}", headers=admin)
+        assert response.status_code == 200
+        response = await async_client.get("/api/current/user", headers=revoked)
+        assert response.status_code == 401
+
 
 @pytest.mark.asyncio
 async def test_root_redirect(async_client):
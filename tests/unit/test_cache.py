@@ -0,0 +1,43 @@
+from unittest.mock import patch
+
+from app.cache import TTLCache
+
+
+def test_cache_get_and_set():
+    cache: TTLCache[str, int] = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+
+
+def test_cache_evicts_least_recently_used():
+    cache: TTLCache[str, int] = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert len(cache) == 2
+
+
+def test_cache_expires_entries():
+    cache: TTLCache[str, int] = TTLCache(maxsize=2, ttl=10)
+    with patch("app.cache.time.monotonic", return_value=100):
+        cache.set("a", 1)
+    with patch("app.cache.time.monotonic", return_value=111):
+        assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_cache_pop():
+    cache: TTLCache[str, int] = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    assert cache.pop("a") == 1
+    assert cache.pop("a") is None
+
+
+def test_cache_disabled():
+    cache: TTLCache[str, int] = TTLCache(maxsize=0, ttl=60)
+    cache.set("a", 1)
+    assert cache.get("a") is None
@@ -0,0 +1,31 @@
+from starlette.requests import Request
+
+from app.codecs import CBOR, MSGPACK, accepted_encoding, media_type
+
+
+def make_request(accept: str) -> Request:
+    return Request({"type": "http", "headers": [(b"accept", accept.encode())]})
+
+
+def test_media_type_normalises_aliases():
+    assert media_type("application/x-msgpack; charset=utf-8") == MSGPACK
+    assert media_type(" Application/CBOR ") == CBOR
+
+
+def test_accepted_encoding():
+    assert accepted_encoding(make_request("application/json")) is None
+    assert accepted_encoding(make_request("text/html, application/cbor")) == CBOR
+    assert accepted_encoding(make_request("application/vnd.msgpack")) == MSGPACK
+
+
+def test_accepted_encoding_honours_quality():
+    assert accepted_encoding(make_request("application/msgpack;q=0")) is None
+    request = make_request("application/json, application/msgpack;q=0.1")
+    assert accepted_encoding(request) is None
+    request = make_request("application/json;q=0.5, application/cbor")
+    assert accepted_encoding(request) == CBOR
+    request = make_request("application/cbor;q=0.5, application/msgpack;q=0.8")
+    assert accepted_encoding(request) == MSGPACK
+    request = make_request("application/msgpack, application/json")
+    assert accepted_encoding(request) is None
+    assert accepted_encoding(make_request("application/msgpack, */*")) == MSGPACK
@@ -0,0 +1,67 @@
+import gzip
+from unittest.mock import patch
+
+import pytest
+
+from app.compression import (
+    CompressionError,
+    StreamCompressor,
+    decompress,
+    preferred_encoding,
+)
+from app.metrics import metrics
+
+
+def test_preferred_encoding():
+    assert preferred_encoding("") is None
+    assert preferred_encoding("gzip, deflate") == "gzip"
+    assert preferred_encoding("gzip;q=0.5, zstd") == "zstd"
+    assert preferred_encoding("zstd;q=0.1, gzip;q=0.9") == "gzip"
+    assert preferred_encoding("gzip;q=0, br") is None
+    assert preferred_encoding("*") is not None
+
+
+def test_decompress_gzip():
+    assert decompress(gzip.compress(b"payload"), "gzip", 100) == b"payload"
+
+
+def test_decompress_rejects_oversized_and_invalid_bodies():
+    with pytest.raises(CompressionError) as e:
+        decompress(gzip.compress(b"x" * 1000), "gzip", 100)
+    assert e.value.status_code == 413
+    with pytest.raises(CompressionError) as e:
+        decompress(gzip.compress(b"payload")[:-8], "gzip", 100)
+    assert e.value.status_code == 400
+    with pytest.raises(CompressionError) as e:
+        decompress(b"payload", "br", 100)
+    assert e.value.status_code == 415
+
+
+def test_decompress_zstd():
+    zstandard = pytest.importorskip("zstandard")
+    body = zstandard.ZstdCompressor().compress(b"payload")
+    assert decompress(body, "zstd", 100) == b"payload"
+
+
+def test_decompress_rejects_invalid_zstd_bodies():
+    zstandard = pytest.importorskip("zstandard")
+    body = zstandard.ZstdCompressor().compress(b"x" * 1000)
+    for invalid in (b"not zstd at all", body[:-4], b""):
+        with pytest.raises(CompressionError) as e:
+            decompress(invalid, "zstd", 10000)
+        assert e.value.status_code == 400
+    with pytest.raises(CompressionError) as e:
+        decompress(body, "zstd", 100)
+    assert e.value.status_code == 413
+
+
+def test_stream_compressor_records_metrics():
+    metrics.clear()
+    with patch("app.compression.settings.compression_gzip_level", 6):
+        compressor = StreamCompressor("gzip")
+        output = compressor.compress(b"a" * 1000, finish=False)
+        output += compressor.compress(b"b" * 1000, finish=True)
+    assert gzip.decompress(output) == b"a" * 1000 + b"b" * 1000
+    snapshot = metrics.snapshot()
+    assert snapshot["counters"]["compression.gzip.bytes_in"] == 2000
+    assert snapshot["gauges"]["compression.gzip.ratio"] < 1
@@ -1,6 +1,7 @@
 from datetime import datetime
 
 import pytest
+from beanie import PydanticObjectId
 
 from app.models.devices import Device, DeviceData
 
@@ -8,28 +9,31 @@ from app.models.devices import Device, DeviceData
 class TestDeviceModel:
     @pytest.mark.asyncio
     async def test_device_creation(self, beanie_init):
-        device = Device(
-            device_id="test_device",
-            data=[
+        device = Device(device_id="test_device")
+        await device.insert()
+        await DeviceData.insert_many(
+            [
                 DeviceData(
+                    device=device.id,
                     data={
                         "test": "data",
                         "list": [1, 2, 3],
-                    }
+                    },
                 ),
                 DeviceData(
+                    device=device.id,
                     data={
                         "more": "data",
                         "some": {"nested": "data"},
-                    }
+                    },
                 ),
-            ],
+            ]
         )
-        await device.insert()
+        data = await DeviceData.find(DeviceData.device == device.id).to_list()
         assert isinstance(device.api_key, str)
-        assert len(device.data) == 2
-        assert device.data[0].data == {"test": "data", "list": [1, 2, 3]}
-        assert isinstance(device.data[0].created_date, datetime)
+        assert len(data) == 2
+        assert data[0].data == {"test": "data", "list": [1, 2, 3]}
+        assert isinstance(data[0].created_date, datetime)
 
     @pytest.mark.asyncio
     async def test_device_retrieval(self, beanie_init):
@@ -44,16 +48,16 @@ class TestDeviceModel:
             Device.device_id == "test_device", fetch_links=True
         )
         data = DeviceData(
+            device=device.id,
             data={
                 "added": "data",
                 "another": {"nested": "data"},
-            }
+            },
         )
-        device.data.append(data)
-        await device.save()
+        await data.insert()
 
-        updated_device = await Device.get(device.id)
-        assert len(updated_device.data) == 3
+        count = await DeviceData.find(DeviceData.device == device.id).count()
+        assert count == 3
 
     @pytest.mark.asyncio
     async def test_device_delete(self, beanie_init):
@@ -65,11 +69,14 @@ class TestDeviceModel:
 
     @pytest.mark.asyncio
     async def test_device_data_creation(self, beanie_init):
+        device = PydanticObjectId()
         device_data = DeviceData(
+            device=device,
             data={
                 "test": "data",
                 "list": [1, 2, 3],
-            }
+            },
         )
+        assert device_data.device == device
         assert device_data.data == {"test": "data", "list": [1, 2, 3]}
         assert isinstance(device_data.created_date, datetime)
@@ -0,0 +1,123 @@
+import io
+import json
+from datetime import datetime
+from unittest.mock import patch
+
+import pytest
+from beanie import PydanticObjectId
+
+from app.export import columnar_rows, csv_rows, ndjson_rows
+
+
+async def documents(count: int):
+    for value in range(count):
+        yield {
+            "_id": PydanticObjectId(),
+            "created_date": datetime(2024, 1, 1, 0, value),
+            "data": {"value": value, "nested": {"a": value}},
+        }
+
+
+@pytest.mark.asyncio
+async def test_ndjson_rows_are_chunked():
+    with patch("app.export.EXPORT_BATCH_SIZE", 2):
+        chunks = [chunk async for chunk in ndjson_rows(documents(5))]
+    assert [chunk.count("\n") for chunk in chunks] == [2, 2, 1]
+
+
+@pytest.mark.asyncio
+async def test_csv_rows_infer_header():
+    with patch("app.export.EXPORT_BATCH_SIZE", 2):
+        chunks = [chunk async for chunk in csv_rows(documents(3), None)]
+    lines = "".join(chunks).splitlines()
+    assert lines[0] == "_id,created_date,value,nested,_extra"
+    assert lines[1].endswith(',2024-01-01T00:00:00,0,"{""a"": 0}",')
+    assert len(chunks) == 2
+
+
+@pytest.mark.asyncio
+async def test_csv_rows_keep_keys_missing_from_header():
+    async def changing():
+        for data in ({"a": 1}, {"a": 2, "b": 3}):
+            yield {
+                "_id": PydanticObjectId(),
+                "created_date": datetime(2024, 1, 1),
+                "data": data,
+            }
+
+    lines = "".join([chunk async for chunk in csv_rows(changing(), None)]).splitlines()
+    assert lines[0] == "_id,created_date,a,_extra"
+    assert lines[1].endswith(",1,")
+    assert lines[2].endswith(',2,"{""b"": 3}"')
+
+
+@pytest.mark.asyncio
+async def test_csv_rows_header_without_rows():
+    chunks = [chunk async for chunk in csv_rows(documents(0), ["value"])]
+    assert chunks == ["_id,created_date,value\r\n"]
+
+
+@pytest.mark.asyncio
+async def test_columnar_rows_arrow_stream():
+    pa = pytest.importorskip("pyarrow")
+
+    async def mixed():
+        for value in (1, 2.5, "bad", None):
+            yield {
+                "_id": PydanticObjectId(),
+                "created_date": datetime(2024, 1, 1),
+                "data": {"value": value, "label": "x"},
+            }
+
+    with patch("app.export.EXPORT_BATCH_SIZE", 2):
+        chunks = [chunk async for chunk in columnar_rows(mixed(), None, "arrow")]
+    table = pa.ipc.open_stream(b"".join(chunks)).read_all()
+    assert table.schema.field("value").type == pa.float64()
+    assert table.column("value").to_pylist() == [1.0, 2.5, None, None]
+    assert table.column("label").to_pylist() == ["x"] * 4
+    assert table.column("_extra").to_pylist() == [None] * 4
+    assert len(chunks) == 3
+
+
+@pytest.mark.asyncio
+async def test_columnar_rows_keep_keys_missing_from_first_batch():
+    pa = pytest.importorskip("pyarrow")
+
+    async def changing():
+        for data in ({"a": 1, "c": None}, {"a": 2}, {"a": 3, "b": 4}, {"b": 5, "c": 6}):
+            yield {
+                "_id": PydanticObjectId(),
+                "created_date": datetime(2024, 1, 1),
+                "data": data,
+            }
+
+    with patch("app.export.EXPORT_BATCH_SIZE", 2):
+        chunks = [chunk async for chunk in columnar_rows(changing(), None, "arrow")]
+    table = pa.ipc.open_stream(b"".join(chunks)).read_all()
+    assert table.column_names == ["_id", "created_date", "a", "_extra"]
+    assert table.column("a").to_pylist() == [1.0, 2.0, 3.0, None]
+    extra = [json.loads(v) if v else None for v in table.column("_extra").to_pylist()]
+    assert extra == [{"c": None}, None, {"b": 4}, {"b": 5, "c": 6}]
+
+
+@pytest.mark.asyncio
+async def test_columnar_rows_parquet():
+    pytest.importorskip("pyarrow")
+    import pyarrow.parquet as pq
+
+    chunks = [
+        chunk async for chunk in columnar_rows(documents(3), ["value"], "parquet")
+    ]
+    table = pq.read_table(io.BytesIO(b"".join(chunks)))
+    assert table.column_names == ["_id", "created_date", "value"]
+    assert table.column("value").to_pylist() == [0.0, 1.0, 2.0]
+
+
+@pytest.mark.asyncio
+async def test_columnar_rows_empty():
+    pa = pytest.importorskip("pyarrow")
+
+    chunks = [chunk async for chunk in columnar_rows(documents(0), None, "arrow")]
+    table = pa.ipc.open_stream(b"".join(chunks)).read_all()
+    assert table.column_names == ["_id", "created_date", "_extra"]
+    assert table.num_rows == 0
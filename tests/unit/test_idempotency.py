@@ -0,0 +1,39 @@
+from unittest.mock import patch
+
+import pytest
+from beanie import PydanticObjectId
+
+from app.idempotency import RecentIds, claim_readings, recent_ids, release_readings
+from app.models.devices import DeviceReadingKey
+
+
+def test_recent_ids_are_bounded():
+    ids = RecentIds()
+    devices = [PydanticObjectId() for _ in range(3)]
+    with (
+        patch("app.idempotency.settings.idempotency_cache_per_device", 2),
+        patch("app.idempotency.settings.idempotency_cache_devices", 2),
+    ):
+        for reading_id in "abc":
+            ids.add((devices[0], reading_id))
+        assert (devices[0], "a") not in ids
+        assert (devices[0], "c") in ids
+        ids.add((devices[1], "a"))
+        ids.add((devices[2], "a"))
+    assert list(ids.devices) == devices[1:]
+
+
+@pytest.mark.asyncio
+async def test_claim_readings(beanie_init):
+    device = PydanticObjectId()
+    claimed = await claim_readings([(device, "a"), None, (device, "a"), (device, "b")])
+    assert claimed == [True, True, False, True]
+
+    assert await claim_readings([(device, "a")]) == [False]
+    recent_ids.clear()
+    assert await claim_readings([(device, "b"), (device, "c")]) == [False, True]
+    assert await DeviceReadingKey.find(DeviceReadingKey.device == device).count() == 3
+
+    await release_readings([(device, "c"), None])
+    assert await claim_readings([(device, "c")]) == [True]
+    await DeviceReadingKey.find(DeviceReadingKey.device == device).delete()
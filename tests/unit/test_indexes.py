@@ -0,0 +1,90 @@
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.indexes import (
+    QueryShape,
+    collection_scans,
+    declared_indexes,
+    is_collection_scan,
+    missing_indexes,
+    verify_indexes,
+    winning_plans,
+)
+from app.models.devices import Device, DeviceData
+from app.models.users import User
+
+
+def test_declared_indexes():
+    assert (("username", 1),) in declared_indexes(User)
+    assert (("api_key", 1),) in declared_indexes(Device)
+    assert (("device", 1), ("created_date", 1), ("_id", 1)) in declared_indexes(
+        DeviceData
+    )
+
+
+@pytest.mark.asyncio
+async def test_missing_indexes(beanie_init):
+    assert await missing_indexes(Device) == []
+    assert await missing_indexes(DeviceData) == []
+
+
+def test_winning_plan_collection_scan():
+    explain = {
+        "queryPlanner": {
+            "winningPlan": {"stage": "FETCH", "inputStage": {"stage": "COLLSCAN"}},
+            "rejectedPlans": [],
+        }
+    }
+    assert [is_collection_scan(plan) for plan in winning_plans(explain)] == [True]
+
+
+def test_winning_plan_index_scan():
+    explain = {
+        "stages": [
+            {
+                "$cursor": {
+                    "queryPlanner": {
+                        "winningPlan": {"stage": "IXSCAN"},
+                        "rejectedPlans": [{"stage": "COLLSCAN"}],
+                    }
+                }
+            }
+        ]
+    }
+    assert [is_collection_scan(plan) for plan in winning_plans(explain)] == [False]
+
+
+def collection_with_plan(stage: str) -> MagicMock:
+    cursor = MagicMock()
+    cursor.sort.return_value = cursor
+    cursor.explain = AsyncMock(
+        return_value={"queryPlanner": {"winningPlan": {"stage": stage}}}
+    )
+    collection = MagicMock()
+    collection.find.return_value = cursor
+    return collection
+
+
+@pytest.mark.asyncio
+async def test_collection_scans():
+    shapes = [
+        QueryShape("scan", User, {"username": ""}),
+        QueryShape("indexed", Device, {"api_key": ""}, [("created_date", -1)]),
+    ]
+    with (
+        patch.object(
+            User, "get_motor_collection", return_value=collection_with_plan("COLLSCAN")
+        ),
+        patch.object(
+            Device, "get_motor_collection", return_value=collection_with_plan("IXSCAN")
+        ),
+    ):
+        assert await collection_scans(shapes) == ["scan"]
+
+
+@pytest.mark.asyncio
+async def test_verify_indexes(beanie_init):
+    with patch("app.indexes.collection_scans", AsyncMock(return_value=["scan"])):
+        problems = await verify_indexes(models=[User, Device])
+    assert problems == ["scan: query falls back to COLLSCAN"]
@@ -0,0 +1,255 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+import pytest
+from beanie import PydanticObjectId
+from fastapi import HTTPException
+from pymongo.errors import BulkWriteError
+
+from app.idempotency import claim_readings, release_readings
+from app.ingest import (
+    IngestBuffer,
+    store_readings,
+    submit_readings,
+    submit_unique_readings,
+)
+from app.models.devices import Device, DeviceData
+
+
+class TestStoreReadings:
+    @pytest.mark.asyncio
+    async def test_store_readings(self, beanie_init):
+        device = Device(device_id="ingest_device")
+        await device.insert()
+        now = datetime.now(timezone.utc)
+        readings = [
+            DeviceData(
+                device=device.id,
+                created_date=now + timedelta(seconds=offset),
+                data={"value": offset},
+            )
+            for offset in (2, 0, 1, 3)
+        ]
+
+        with patch("app.ingest.settings.device_data_cap", 3):
+            await store_readings(readings)
+
+        stored = await Device.get(device.id)
+        assert stored.reading_count == 4
+        assert [r.data["value"] for r in stored.recent_data] == [1, 2, 3]
+        assert await DeviceData.find(DeviceData.device == device.id).count() == 4
+        await device.delete()
+
+    @pytest.mark.asyncio
+    async def test_store_readings_never_moves_last_reading_back(self, beanie_init):
+        device = Device(device_id="late_reading_device")
+        await device.insert()
+        now = datetime.now(timezone.utc)
+
+        for offset in (10, 0):
+            await store_readings(
+                [
+                    DeviceData(
+                        device=device.id,
+                        created_date=now + timedelta(seconds=offset),
+                        data={},
+                    )
+                ]
+            )
+
+        stored = await Device.get(device.id)
+        last_reading_date = stored.last_reading_date.replace(tzinfo=timezone.utc)
+        assert last_reading_date > now + timedelta(seconds=5)
+        await DeviceData.find(DeviceData.device == device.id).delete()
+        await device.delete()
+
+    @pytest.mark.asyncio
+    async def test_store_readings_keeps_revision(self, beanie_init):
+        device = Device(device_id="revision_device")
+        await device.insert()
+        device = await Device.get(device.id)
+
+        await store_readings([DeviceData(device=device.id, data={"value": 1})])
+        await device.update({"$set": {"notes": {"interval": 60}}})
+
+        stored = await Device.get(device.id)
+        assert stored.notes == {"interval": 60}
+        assert stored.reading_count == 1
+        await device.delete()
+
+    @pytest.mark.asyncio
+    async def test_store_readings_without_cap(self, beanie_init):
+        device = Device(device_id="uncapped_device")
+        await device.insert()
+
+        with patch("app.ingest.settings.device_data_cap", 0):
+            await store_readings([DeviceData(device=device.id, data={"value": 1})])
+
+        stored = await Device.get(device.id)
+        assert stored.reading_count == 1
+        assert stored.recent_data == []
+        await device.delete()
+
+
+class TestIngestBuffer:
+    @pytest.mark.asyncio
+    async def test_buffer_coalesces_and_drains(self, beanie_init):
+        device = Device(device_id="buffered_device")
+        await device.insert()
+        buffer = IngestBuffer()
+        with patch("app.ingest.settings.ingest_flush_interval", 60):
+            buffer.start()
+            assert buffer.put([DeviceData(device=device.id, data={"v": 1})])
+            assert buffer.put([DeviceData(device=device.id, data={"v": 2})])
+            assert len(buffer.pending[device.id]) == 2
+            await buffer.stop()
+
+        assert buffer.size == 0
+        stored = await Device.get(device.id)
+        assert stored.reading_count == 2
+        await device.delete()
+
+    @pytest.mark.asyncio
+    async def test_buffer_flushes_at_size(self, beanie_init):
+        device = Device(device_id="size_flush_device")
+        await device.insert()
+        buffer = IngestBuffer()
+        with (
+            patch("app.ingest.settings.ingest_flush_interval", 60),
+            patch("app.ingest.settings.ingest_flush_size", 2),
+        ):
+            buffer.start()
+            buffer.put([DeviceData(device=device.id, data={"v": v}) for v in (1, 2)])
+            for _ in range(10):
+                await asyncio.sleep(0)
+            assert buffer.size == 0
+            await buffer.stop()
+        assert (await Device.get(device.id)).reading_count == 2
+        await device.delete()
+
+    @pytest.mark.asyncio
+    async def test_buffer_requeues_on_failure(self):
+        buffer = IngestBuffer()
+        device = PydanticObjectId()
+        buffer.put([DeviceData(device=device, data={"v": 1})])
+        with patch("app.ingest.DeviceData.insert_many", side_effect=Exception("down")):
+            with pytest.raises(Exception):
+                await buffer.flush()
+        assert buffer.size == 1
+        assert buffer.pending[device][0].data == {"v": 1}
+
+    @pytest.mark.asyncio
+    async def test_buffer_drops_readings_that_keep_failing(self):
+        buffer = IngestBuffer()
+        buffer.put([DeviceData(device=PydanticObjectId(), data={"v": 1})])
+        with (
+            patch("app.ingest.settings.ingest_flush_retries", 1),
+            patch("app.ingest.DeviceData.insert_many", side_effect=Exception("down")),
+        ):
+            for _ in range(2):
+                with pytest.raises(Exception):
+                    await buffer.flush()
+        assert buffer.size == 0
+        assert not buffer.pending
+
+    @pytest.mark.asyncio
+    async def test_buffer_does_not_rewrite_stored_readings(self, beanie_init):
+        device = Device(device_id="rollup_failure_device")
+        await device.insert()
+        buffer = IngestBuffer()
+        buffer.put([DeviceData(device=device.id, data={"v": v}) for v in (1, 2)])
+        with patch("app.ingest.update_rollups", side_effect=Exception("down")):
+            assert await buffer.flush() == 2
+        assert buffer.size == 0
+
+        buffer.put([DeviceData(device=device.id, data={"v": 3})])
+        assert await buffer.flush() == 1
+        assert await DeviceData.find(DeviceData.device == device.id).count() == 3
+        assert (await Device.get(device.id)).reading_count == 3
+        await DeviceData.find(DeviceData.device == device.id).delete()
+        await device.delete()
+
+    @pytest.mark.asyncio
+    async def test_buffer_quarantines_rejected_readings(self, beanie_init):
+        device = Device(device_id="rejected_reading_device")
+        await device.insert()
+        stored = DeviceData(device=device.id, data={"v": 0})
+        await stored.insert()
+        buffer = IngestBuffer()
+        buffer.put(
+            [
+                DeviceData(device=device.id, data={"v": 1}),
+                stored,
+                DeviceData(device=device.id, data={"v": 2}),
+            ]
+        )
+        with pytest.raises(BulkWriteError):
+            await buffer.flush()
+        assert [reading.data for reading in buffer.pending[device.id]] == [{"v": 2}]
+        assert await buffer.flush() == 1
+        assert await DeviceData.find(DeviceData.device == device.id).count() == 3
+        assert (await Device.get(device.id)).reading_count == 2
+        await DeviceData.find(DeviceData.device == device.id).delete()
+        await device.delete()
+
+    @pytest.mark.asyncio
+    async def test_buffer_releases_reading_ids_it_drops(self, beanie_init):
+        device = Device(device_id="released_reading_device")
+        await device.insert()
+        stored = DeviceData(device=device.id, data={"v": 0})
+        await stored.insert()
+        buffer = IngestBuffer()
+        keys = [(device.id, "kept"), (device.id, "rejected"), (device.id, "retried")]
+        readings = [
+            DeviceData(device=device.id, data={"v": 1}),
+            stored,
+            DeviceData(device=device.id, data={"v": 2}),
+        ]
+        assert await claim_readings(keys) == [True] * 3
+        buffer.put(readings, keys)
+        with patch("app.ingest.settings.ingest_flush_retries", 0):
+            with pytest.raises(BulkWriteError):
+                await buffer.flush()
+
+        assert buffer.size == 0
+        assert buffer.keys == {}
+        assert await claim_readings(keys) == [False, True, True]
+        await release_readings(keys)
+        await DeviceData.find(DeviceData.device == device.id).delete()
+        await device.delete()
+
+    @pytest.mark.asyncio
+    async def test_submit_unique_readings_buffers_keys(self, beanie_init):
+        device = PydanticObjectId()
+        reading = DeviceData(device=device, data={"v": 1})
+        with (
+            patch("app.ingest.ingest_buffer", IngestBuffer()) as buffer,
+            patch("app.ingest.settings.ingest_flush_interval", 60),
+        ):
+            buffer.start()
+            await submit_unique_readings([reading], [(device, "a")])
+            assert buffer.keys == {reading.id: (device, "a")}
+            buffer.pending.clear()
+            buffer.size = 0
+            await buffer.stop()
+        await release_readings([(device, "a")])
+
+    @pytest.mark.asyncio
+    async def test_submit_readings_backpressure(self):
+        reading = DeviceData(device=PydanticObjectId(), data={"v": 1})
+        with (
+            patch("app.ingest.ingest_buffer", IngestBuffer()) as buffer,
+            patch("app.ingest.settings.ingest_buffer_max", 1),
+            patch("app.ingest.settings.ingest_flush_interval", 60),
+        ):
+            buffer.start()
+            await submit_readings([reading])
+            with pytest.raises(HTTPException) as exc_info:
+                await submit_readings([reading])
+            buffer.pending.clear()
+            buffer.size = 0
+            await buffer.stop()
+
+        assert exc_info.value.status_code == 503
+        assert exc_info.value.headers == {"Retry-After": "60"}
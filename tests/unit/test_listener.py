@@ -0,0 +1,99 @@
+import asyncio
+import json
+import socket
+from unittest.mock import patch
+
+import pytest
+
+from app.listener import IngestListener, decode_packet, ingest_packets
+from app.metrics import metrics
+from app.models.devices import Device, DeviceData, DeviceRateLimit
+
+
+def free_port(kind: int) -> int:
+    with socket.socket(socket.AF_INET, kind) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def packet(device: Device, **data) -> bytes:
+    return json.dumps(
+        {"api_key": device.api_key, "device_id": device.device_id, "data": data}
+    ).encode()
+
+
+def test_decode_packet():
+    item = decode_packet(b'{"api_key": "k", "device_id": "d", "data": {"v": 1}}\n')
+    assert (item.api_key, item.device_id, item.data) == ("k", "d", {"v": 1})
+    assert decode_packet(b'{"device_id": "d", "data": {}}') is None
+    assert decode_packet(b"{not json") is None
+    assert decode_packet(b'{"api_key": "k", "device_id": "d"}') is None
+
+
+@pytest.mark.asyncio
+async def test_listener_ingests_tcp_and_udp_packets(beanie_init):
+    device = Device(device_id="listener_device")
+    await device.insert()
+    udp_port, tcp_port = free_port(socket.SOCK_DGRAM), free_port(socket.SOCK_STREAM)
+    listener = IngestListener()
+    metrics.clear()
+
+    with (
+        patch("app.listener.settings.listener_udp_port", udp_port),
+        patch("app.listener.settings.listener_tcp_port", tcp_port),
+    ):
+        await listener.start()
+        _, writer = await asyncio.open_connection("127.0.0.1", tcp_port)
+        writer.write(packet(device, v=1) + b"\n" + b"garbage\n")
+        writer.write(packet(device, v=2).replace(b"listener_device", b"other") + b"\n")
+        await writer.drain()
+        writer.close()
+
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+            sock.sendto(packet(device, v=3), ("127.0.0.1", udp_port))
+
+        for _ in range(100):
+            counters = metrics.snapshot()["counters"]
+            if (
+                counters.get("listener.accepted", 0)
+                + counters.get("listener.rejected", 0)
+                >= 4
+            ):
+                break
+            await asyncio.sleep(0.01)
+        await listener.stop()
+
+    counters = metrics.snapshot()["counters"]
+    assert counters["listener.accepted"] == 2
+    assert counters["listener.rejected"] == 2
+    readings = await DeviceData.find(DeviceData.device == device.id).to_list()
+    values = sorted(reading.data["v"] for reading in readings)
+    assert values == [1, 3]
+    await DeviceData.find(DeviceData.device == device.id).delete()
+    await device.delete()
+
+
+@pytest.mark.asyncio
+async def test_listener_drops_when_queue_is_full():
+    listener = IngestListener()
+    listener.queue = asyncio.Queue(1)
+    metrics.clear()
+    body = b'{"api_key": "k", "device_id": "d", "data": {}}'
+    listener.receive(body)
+    listener.receive(body)
+    assert metrics.snapshot()["counters"]["listener.dropped"] == 1
+
+
+@pytest.mark.asyncio
+async def test_ingest_packets_throttles_chatty_devices(beanie_init):
+    device = Device(
+        device_id="chatty_listener_device",
+        rate_limit=DeviceRateLimit(rate=0.01, burst=1),
+    )
+    await device.insert()
+    metrics.clear()
+    await ingest_packets([decode_packet(packet(device, v=v)) for v in range(3)])
+    counters = metrics.snapshot()["counters"]
+    assert (counters["listener.accepted"], counters["listener.throttled"]) == (1, 2)
+    await DeviceData.find(DeviceData.device == device.id).delete()
+    await device.delete()
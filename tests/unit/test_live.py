@@ -0,0 +1,84 @@
+import asyncio
+import json
+from datetime import datetime, timedelta, timezone
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from beanie import PydanticObjectId
+
+from app.live import ReadingBroker, changed_readings, sse_event, sse_events
+from app.metrics import metrics
+from app.models.devices import DeviceData
+
+
+def test_broker_fans_out_to_subscribers():
+    broker = ReadingBroker()
+    device, other = PydanticObjectId(), PydanticObjectId()
+    with (
+        broker.subscription([device]) as first,
+        broker.subscription([device, other]) as second,
+    ):
+        broker.publish([DeviceData(device=device, data={"v": 1})])
+        broker.publish([DeviceData(device=other, data={"v": 2})])
+        assert first.qsize() == 1
+        assert second.qsize() == 2
+    assert broker.subscribers == {}
+
+
+def test_broker_drops_when_subscriber_is_full():
+    broker = ReadingBroker()
+    device = PydanticObjectId()
+    metrics.clear()
+    with patch("app.live.settings.live_queue_size", 1):
+        with broker.subscription([device]) as queue:
+            broker.publish([DeviceData(device=device, data={}) for _ in range(3)])
+            assert queue.qsize() == 1
+    assert metrics.snapshot()["counters"]["live.dropped"] == 2
+
+
+def test_sse_event_format():
+    reading = DeviceData(device=PydanticObjectId(), data={"temp": 20})
+    event = sse_event(reading)
+    assert event.startswith(f"id: {reading.id}\nevent: reading\ndata: ")
+    payload = json.loads(event.split("data: ", 1)[1])
+    assert payload["_id"] == str(reading.id)
+    assert payload["device"] == str(reading.device)
+    assert payload["data"] == {"temp": 20}
+
+
+@pytest.mark.asyncio
+async def test_sse_events_streams_published_readings():
+    device = PydanticObjectId()
+    request = MagicMock()
+    request.is_disconnected = AsyncMock(side_effect=[False, False, True])
+    with (
+        patch("app.live.reading_broker", ReadingBroker()) as broker,
+        patch("app.live.settings.live_heartbeat_interval", 0.01),
+    ):
+        events = sse_events(request, [device])
+        first = asyncio.ensure_future(events.__anext__())
+        await asyncio.sleep(0)
+        broker.publish([DeviceData(device=device, data={"v": 1})])
+        assert "event: reading" in await first
+        assert await events.__anext__() == ": keepalive\n\n"
+        with pytest.raises(StopAsyncIteration):
+            await events.__anext__()
+        assert broker.subscribers == {}
+
+
+def test_changed_readings_only_emits_new_readings():
+    device = PydanticObjectId()
+    started = datetime(2024, 5, 1, tzinfo=timezone.utc)
+    recent = [
+        {
+            "_id": PydanticObjectId(),
+            "created_date": started + timedelta(minutes=n),
+            "data": {},
+        }
+        for n in (-1, 1, 2)
+    ]
+    watermarks: dict = {}
+    change = {"fullDocument": {"_id": device, "recent_data": recent}}
+    assert len(changed_readings(change, watermarks, started)) == 2
+    assert changed_readings(change, watermarks, started) == []
+    assert changed_readings({"fullDocument": None}, watermarks, started) == []
@@ -15,6 +15,13 @@ def mock_settings():
     settings.initial_user_name = "admin"
     settings.initial_user_mail = "admin@example.com"
     settings.initial_user_pass = "password123"
+    settings.verify_indexes = False
+    settings.ingest_buffer_enabled = False
+    settings.retention_prune_enabled = False
+    settings.live_change_stream = False
+    settings.notes_change_stream = False
+    settings.listener_udp_port = 0
+    settings.listener_tcp_port = 0
     return settings
 
 
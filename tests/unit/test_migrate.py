@@ -0,0 +1,49 @@
+import pytest
+from beanie import PydanticObjectId
+
+from app.migrate import MIGRATION_FIELD, migrate_device_data
+from app.models.devices import Device, DeviceData
+
+
+@pytest.mark.asyncio
+async def test_migrate_device_data(beanie_init):
+    device = Device(device_id="embedded_device")
+    await device.insert()
+    await Device.get_motor_collection().update_one(
+        {"_id": device.id},
+        {"$set": {"data": [{"_id": PydanticObjectId(), "data": {"temp": 21.5}}]}},
+    )
+
+    assert await migrate_device_data() == 1
+    assert await migrate_device_data() == 0
+
+    stored = await Device.get_motor_collection().find_one({"_id": device.id})
+    assert "data" not in stored
+    assert stored["reading_count"] == 1
+    assert stored["last_reading_date"] is not None
+    assert [reading["data"] for reading in stored["recent_data"]] == [{"temp": 21.5}]
+    data = await DeviceData.find(DeviceData.device == device.id).to_list()
+    assert [reading.data for reading in data] == [{"temp": 21.5}]
+    await DeviceData.find(DeviceData.device == device.id).delete()
+    await device.delete()
+
+
+@pytest.mark.asyncio
+async def test_migrate_device_data_resumes_without_duplicates(beanie_init):
+    device = Device(device_id="half_migrated_device")
+    await device.insert()
+    readings = [{"_id": PydanticObjectId(), "data": {"temp": t}} for t in (1, 2)]
+    await DeviceData.insert_many([DeviceData(device=device.id, **readings[0])])
+    await Device.get_motor_collection().update_one(
+        {"_id": device.id}, {"$set": {MIGRATION_FIELD: readings}}
+    )
+
+    assert await migrate_device_data() == 1
+
+    stored = await Device.get_motor_collection().find_one({"_id": device.id})
+    assert MIGRATION_FIELD not in stored
+    assert stored["reading_count"] == 2
+    data = await DeviceData.find(DeviceData.device == device.id).to_list()
+    assert sorted(reading.data["temp"] for reading in data) == [1, 2]
+    await DeviceData.find(DeviceData.device == device.id).delete()
+    await device.delete()
@@ -0,0 +1,24 @@
+import pytest
+from beanie import PydanticObjectId
+
+from app.notify import Waiters, notes_change_watcher, notes_waiters, wait_for_change
+
+
+@pytest.mark.asyncio
+async def test_waiters_wake_only_their_document():
+    waiters = Waiters()
+    device, other = PydanticObjectId(), PydanticObjectId()
+    with waiters.waiting(device) as first, waiters.waiting(other) as second:
+        waiters.notify(device)
+        assert await wait_for_change(first, 0.01)
+        assert not first.is_set()
+        assert not await wait_for_change(second, 0.01)
+    assert waiters.events == {}
+
+
+@pytest.mark.asyncio
+async def test_notes_change_watcher_notifies_waiters():
+    device = PydanticObjectId()
+    with notes_waiters.waiting(device) as changed:
+        notes_change_watcher.handle({"documentKey": {"_id": device}})
+        assert changed.is_set()
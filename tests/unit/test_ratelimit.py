@@ -0,0 +1,85 @@
+from unittest.mock import patch
+
+import pytest
+from beanie import PydanticObjectId
+
+from app.models.devices import DevicePrincipal, DeviceRateLimit, DeviceRateState
+from app.ratelimit import RateLimiter, admit, device_limits, throttle, throttle_readings
+
+
+def test_admit_allows_burst_then_paces():
+    tat = None
+    for _ in range(3):
+        tat, admitted, wait = admit(tat, 100.0, 1.0, 3)
+        assert (admitted, wait) == (1, 0)
+    tat, admitted, wait = admit(tat, 100.0, 1.0, 3)
+    assert (admitted, wait) == (0, pytest.approx(1.0))
+    tat, admitted, wait = admit(tat, 101.0, 1.0, 3)
+    assert (admitted, wait) == (1, 0)
+    _, admitted, wait = admit(tat, 101.5, 1.0, 3)
+    assert (admitted, wait) == (0, pytest.approx(0.5))
+
+
+def test_admit_charges_cost_up_to_burst():
+    tat, admitted, wait = admit(None, 100.0, 1.0, 3, cost=5)
+    assert (admitted, wait) == (3, pytest.approx(1.0))
+    _, admitted, wait = admit(tat, 100.0, 1.0, 3, cost=2)
+    assert (admitted, wait) == (0, pytest.approx(1.0))
+
+
+def test_device_limits_prefer_device_override():
+    device = DevicePrincipal(_id=PydanticObjectId(), device_id="d")
+    with (
+        patch("app.ratelimit.settings.ingest_rate", 5.0),
+        patch("app.ratelimit.settings.ingest_burst", 10),
+    ):
+        assert device_limits(device) == (5.0, 10)
+        device.rate_limit = DeviceRateLimit(rate=0.5, burst=2)
+        assert device_limits(device) == (0.5, 2)
+
+
+def test_rate_limiter_is_bounded():
+    limiter = RateLimiter()
+    devices = [PydanticObjectId() for _ in range(3)]
+    with patch("app.ratelimit.settings.ingest_rate_max_devices", 2):
+        for device in devices:
+            assert limiter.acquire(device, 1.0, 1, 1) == (1, 0)
+    assert list(limiter.tats) == devices[1:]
+
+
+@pytest.mark.asyncio
+async def test_throttle_in_memory_and_shared(beanie_init):
+    device = DevicePrincipal(
+        _id=PydanticObjectId(),
+        device_id="d",
+        rate_limit=DeviceRateLimit(rate=0.01, burst=2),
+    )
+    assert [(await throttle(device))[0] for _ in range(3)] == [1, 1, 0]
+    with patch("app.ratelimit.settings.ingest_rate_shared", True):
+        results = [await throttle(device) for _ in range(3)]
+    assert results[:2] == [(1, 0), (1, 0)]
+    assert results[2][0] == 0
+    assert results[2][1] == pytest.approx(100, abs=1)
+    state = await DeviceRateState.get(device.id)
+    assert state is not None
+    await state.delete()
+
+    device.rate_limit = DeviceRateLimit(rate=0)
+    assert [await throttle(device) for _ in range(5)] == [(1, 0)] * 5
+
+
+@pytest.mark.asyncio
+async def test_throttle_readings_charges_each_owner():
+    chatty = DevicePrincipal(
+        _id=PydanticObjectId(),
+        device_id="chatty",
+        rate_limit=DeviceRateLimit(rate=0.01, burst=2),
+    )
+    quiet = DevicePrincipal(
+        _id=PydanticObjectId(),
+        device_id="quiet",
+        rate_limit=DeviceRateLimit(rate=0.01, burst=5),
+    )
+    owners = [chatty, quiet, chatty, chatty, quiet]
+    assert await throttle_readings(owners) == [True, True, True, False, True]
+    assert await throttle_readings([chatty, quiet]) == [False, True]
@@ -0,0 +1,89 @@
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+import pytest
+
+from app.ingest import store_readings
+from app.metrics import metrics
+from app.models.devices import Device, DeviceData, DeviceRetention, DeviceRollup
+from app.retention import prune_expired, retention_days
+
+
+def test_retention_days_falls_back_to_settings():
+    with (
+        patch("app.retention.settings.device_data_retention_days", 30),
+        patch("app.retention.settings.device_rollup_retention_days", 730),
+    ):
+        assert retention_days(DeviceRetention()) == (30, 730)
+        assert retention_days(DeviceRetention(raw_days=7)) == (7, 730)
+
+
+@pytest.mark.asyncio
+async def test_prune_expired_honours_device_retention(beanie_init):
+    now = datetime.now(timezone.utc)
+    kept = Device(device_id="retention_kept")
+    pruned = Device(device_id="retention_pruned", retention=DeviceRetention(raw_days=7))
+    await Device.insert_many([kept, pruned])
+    for device in (kept, pruned):
+        await DeviceData.insert_many(
+            [
+                DeviceData(
+                    device=device.id, created_date=now - timedelta(days=days), data={}
+                )
+                for days in (1, 10)
+            ]
+        )
+        await DeviceRollup(
+            device=device.id,
+            field="temp",
+            resolution="1d",
+            bucket=now - timedelta(days=10),
+            count=1,
+            sum=1,
+            min=1,
+            max=1,
+        ).insert()
+
+    metrics.clear()
+    totals = await prune_expired(now)
+
+    assert totals["readings"] == 1
+    assert totals["rollups"] == 0
+    assert await DeviceData.find(DeviceData.device == kept.id).count() == 2
+    assert await DeviceData.find(DeviceData.device == pruned.id).count() == 1
+    assert metrics.snapshot()["counters"]["retention.readings_pruned"] == 1
+
+    with patch("app.retention.settings.device_rollup_retention_days", 5):
+        totals = await prune_expired(now)
+    assert totals["rollups"] >= 2
+    assert await DeviceRollup.find(DeviceRollup.device == pruned.id).count() == 0
+    assert metrics.snapshot()["counters"]["retention.runs"] == 2
+
+    for device in (kept, pruned):
+        await DeviceData.find(DeviceData.device == device.id).delete()
+        await device.delete()
+
+
+@pytest.mark.asyncio
+async def test_prune_expired_updates_device_counters(beanie_init):
+    now = datetime.now(timezone.utc)
+    device = Device(
+        device_id="retention_counted", retention=DeviceRetention(raw_days=7)
+    )
+    await device.insert()
+    await store_readings(
+        [
+            DeviceData(
+                device=device.id, created_date=now - timedelta(days=days), data={}
+            )
+            for days in (1, 10, 20)
+        ]
+    )
+
+    await prune_expired(now)
+
+    stored = await Device.get(device.id)
+    assert stored.reading_count == 1
+    assert len(stored.recent_data) == 1
+    await DeviceData.find(DeviceData.device == device.id).delete()
+    await device.delete()
@@ -0,0 +1,53 @@
+from datetime import datetime, timezone
+
+import pytest
+from beanie import PydanticObjectId
+
+from app.models.devices import DeviceData, DeviceRollup
+from app.rollups import aggregate_readings, bucket_start, update_rollups
+
+
+def test_bucket_start():
+    created_date = datetime(2024, 5, 1, 13, 45, 30, tzinfo=timezone.utc)
+    assert bucket_start(created_date, 3600) == datetime(
+        2024, 5, 1, 13, tzinfo=timezone.utc
+    )
+    assert bucket_start(created_date.replace(tzinfo=None), 86400) == datetime(
+        2024, 5, 1, tzinfo=timezone.utc
+    )
+
+
+def test_aggregate_readings_skips_non_numeric():
+    device = PydanticObjectId()
+    created_date = datetime(2024, 5, 1, 13, 45, tzinfo=timezone.utc)
+    readings = [
+        DeviceData(
+            device=device,
+            created_date=created_date,
+            data={"temp": value, "label": "x", "ok": True},
+        )
+        for value in (20, 22.5, 18)
+    ]
+    rollups = aggregate_readings(readings)
+    assert len(rollups) == 3
+    hour = bucket_start(created_date, 3600)
+    assert rollups[(device, "temp", "1h", hour)] == {
+        "count": 3,
+        "sum": 60.5,
+        "min": 18,
+        "max": 22.5,
+    }
+
+
+@pytest.mark.asyncio
+async def test_update_rollups_is_incremental(beanie_init):
+    device = PydanticObjectId()
+    created_date = datetime(2024, 5, 1, 13, 45, tzinfo=timezone.utc)
+    for value in (10, 30):
+        await update_rollups(
+            [DeviceData(device=device, created_date=created_date, data={"temp": value})]
+        )
+    rollup = await DeviceRollup.find_one(
+        {"device": device, "field": "temp", "resolution": "1d"}
+    )
+    assert (rollup.samples, rollup.sum, rollup.min, rollup.max) == (2, 40, 10, 30)
@@ -0,0 +1,68 @@
+import pytest
+from beanie import PydanticObjectId
+from pydantic import ValidationError
+
+from app.models.devices import DevicePrincipal, DeviceSchema
+from app.schemas import compiled_validator, validate_data
+
+
+def principal(schema: dict = None) -> DevicePrincipal:
+    return DevicePrincipal(
+        id=PydanticObjectId(),
+        device_id="schema_device",
+        data_schema=DeviceSchema.model_validate(schema) if schema else None,
+    )
+
+
+def test_validate_data_without_schema_passes_through():
+    data = {"anything": ["goes"]}
+    assert validate_data(principal(), data) is data
+
+
+def test_validate_data_coerces_types():
+    device = principal(
+        {
+            "fields": {
+                "temp": {"type": "float", "unit": "C", "required": True},
+                "count": {"type": "int"},
+                "ok": {"type": "bool"},
+            }
+        }
+    )
+    assert validate_data(device, {"temp": 21, "count": "3", "ok": "true"}) == {
+        "temp": 21.0,
+        "count": 3,
+        "ok": True,
+    }
+    assert validate_data(device, {"temp": "18.5"}) == {"temp": 18.5}
+
+
+def test_validate_data_rejects_mismatches():
+    device = principal({"fields": {"temp": {"type": "float", "required": True}}})
+    with pytest.raises(ValidationError):
+        validate_data(device, {"humidity": 40})
+    with pytest.raises(ValidationError):
+        validate_data(device, {"temp": 21, "humidity": 40})
+    with pytest.raises(ValidationError):
+        validate_data(device, {"temp": "warm"})
+
+
+def test_extra_fields_and_awkward_names():
+    device = principal(
+        {
+            "fields": {"temp-c": {"type": "float"}, "model_config": {"type": "int"}},
+            "extra": "allow",
+        }
+    )
+    assert validate_data(device, {"temp-c": 1, "model_config": "2", "x": "y"}) == {
+        "temp-c": 1.0,
+        "model_config": 2,
+        "x": "y",
+    }
+
+
+def test_validators_are_cached():
+    schema = DeviceSchema.model_validate({"fields": {"v": {"type": "int"}}})
+    assert compiled_validator(schema.model_dump_json()) is compiled_validator(
+        schema.model_dump_json()
+    )
@@ -0,0 +1,115 @@
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+import pytest
+from beanie import PydanticObjectId
+
+from app.metrics import metrics
+from app.models.devices import DeviceData
+from app.window import HotWindow
+
+
+def readings_for(device_id, start, values):
+    return [
+        DeviceData(
+            device=device_id,
+            created_date=start + timedelta(seconds=offset),
+            data={"v": offset},
+        )
+        for offset in values
+    ]
+
+
+@pytest.mark.asyncio
+async def test_window_warms_once_then_serves_from_memory(beanie_init):
+    device_id = PydanticObjectId()
+    start = datetime(2024, 5, 1, tzinfo=timezone.utc)
+    await DeviceData.insert_many(readings_for(device_id, start, range(5)))
+    window = HotWindow()
+    metrics.clear()
+
+    with patch("app.window.settings.hot_window_size", 3):
+        latest = await window.latest(device_id, 2, 5)
+        assert [r.data["v"] for r in latest] == [3, 4]
+
+        window.extend(readings_for(device_id, start, [5]))
+        latest = await window.latest(device_id, 3, 6, start + timedelta(seconds=5))
+        assert [r.data["v"] for r in latest] == [3, 4, 5]
+        assert latest[-1].created_date.tzinfo is None
+
+    counters = metrics.snapshot()["counters"]
+    assert (counters["hot_window.misses"], counters["hot_window.hits"]) == (1, 1)
+    await DeviceData.find(DeviceData.device == device_id).delete()
+
+
+@pytest.mark.asyncio
+async def test_window_keeps_readings_in_time_order(beanie_init):
+    device_id = PydanticObjectId()
+    start = datetime(2024, 5, 1, tzinfo=timezone.utc)
+    window = HotWindow()
+    await window.latest(device_id, 5, 0)
+    window.extend(readings_for(device_id, start, [2, 0, 1]))
+    assert [r.data["v"] for r in await window.latest(device_id, 5, 3)] == [0, 1, 2]
+    assert window.size == 3
+
+
+@pytest.mark.asyncio
+async def test_window_ignores_devices_it_does_not_hold(beanie_init):
+    window = HotWindow()
+    window.extend(readings_for(PydanticObjectId(), datetime.now(timezone.utc), [1]))
+    assert window.windows == {}
+
+
+@pytest.mark.asyncio
+async def test_window_evicts_least_recently_used_devices(beanie_init):
+    start = datetime(2024, 5, 1, tzinfo=timezone.utc)
+    devices = [PydanticObjectId() for _ in range(3)]
+    window = HotWindow()
+    with patch("app.window.settings.hot_window_max_readings", 4):
+        for device_id in devices:
+            await window.latest(device_id, 2, 0)
+            window.extend(readings_for(device_id, start, [0, 1]))
+        assert list(window.windows) == devices[1:]
+        assert window.size == 4
+
+
+@pytest.mark.asyncio
+async def test_window_expires(beanie_init):
+    device_id = PydanticObjectId()
+    window = HotWindow()
+    with patch("app.window.settings.hot_window_ttl", -1):
+        await window.latest(device_id, 1, 0)
+    assert window.cached(device_id, 0) is None
+    assert window.size == 0
+
+
+@pytest.mark.asyncio
+async def test_window_rewarms_when_device_counters_moved(beanie_init):
+    device_id = PydanticObjectId()
+    start = datetime(2024, 5, 1, tzinfo=timezone.utc)
+    await DeviceData.insert_many(readings_for(device_id, start, range(2)))
+    window = HotWindow()
+    await window.latest(device_id, 5, 2)
+
+    await DeviceData.insert_many(readings_for(device_id, start, [2]))
+    latest = await window.latest(device_id, 5, 3, start + timedelta(seconds=2))
+    assert [r.data["v"] for r in latest] == [0, 1, 2]
+
+    assert window.peek(device_id, 5, 3, start + timedelta(seconds=9)) is None
+    assert device_id not in window.windows
+    await DeviceData.find(DeviceData.device == device_id).delete()
+
+
+@pytest.mark.asyncio
+async def test_window_sync_drops_incomplete_deltas(beanie_init):
+    device_id = PydanticObjectId()
+    start = datetime(2024, 5, 1, tzinfo=timezone.utc)
+    window = HotWindow()
+    await window.latest(device_id, 5, 0)
+
+    window.sync(device_id, readings_for(device_id, start, [0, 1]), 2)
+    assert [r.data["v"] for r in window.peek(device_id, 5, 2)] == [0, 1]
+
+    window.sync(device_id, readings_for(device_id, start, [5]), 4)
+    assert device_id not in window.windows
+    assert window.size == 0